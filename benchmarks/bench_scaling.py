@@ -0,0 +1,52 @@
+"""Reports the fit time of the alpha search at increasing numbers of workers.
+
+The default multi_hot encoding keeps the design matrix sparse and about as wide as the
+vocabulary. The dense onehot encoding has one column per distinct language combination,
+which is close to one per row on large synthetic surveys.
+
+Usage: benchmarks/bench_scaling.py [--rows=<rows>] [--workers=<workers>] [--backend=<backend>] [--blas_threads=<blas_threads>] [--encoding=<encoding>]
+
+Options:
+--rows=<rows>                  Number of synthetic training rows [default: 100000]
+--workers=<workers>            Comma separated worker counts [default: 1,2,4,8]
+--backend=<backend>            joblib backend: loky, multiprocessing or threading [default: loky]
+--blas_threads=<blas_threads>  Cap on BLAS/OpenMP threads per worker [default: 1]
+--encoding=<encoding>          Feature encoding: multi_hot (sparse), sparse (one-hot) or onehot (dense) [default: multi_hot]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from docopt import docopt
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, os.pardir, "src"))
+
+
+ENCODINGS = {"multi_hot": (True, True), "sparse": (True, False), "onehot": (False, False)}
+
+
+def main(rows=100000, workers="1,2,4,8", backend="loky", blas_threads=1, encoding="multi_hot"):
+    from salary_prediction_model import build_model
+    from synthetic_survey import make_survey
+
+    sparse, multi_hot = ENCODINGS[encoding]
+    train_df = make_survey(int(rows), seed=1)
+    baseline = None
+    for n_jobs in [int(w) for w in workers.split(",")]:
+        with tempfile.TemporaryDirectory() as out_dir:
+            start = time.perf_counter()
+            build_model(train_df, out_dir, sparse=sparse, multi_hot=multi_hot, n_jobs=n_jobs, backend=backend,
+                        blas_threads=int(blas_threads) if blas_threads else None)
+            elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{encoding} {backend} n_jobs={n_jobs:>2} blas_threads={blas_threads}: {elapsed:7.2f} s "
+              f"(speed-up {baseline / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--rows"], opt["--workers"], opt["--backend"], opt["--blas_threads"], opt["--encoding"])
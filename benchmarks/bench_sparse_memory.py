@@ -0,0 +1,81 @@
+"""Compares peak memory and fit time of the dense and sparse one-hot salary pipelines.
+
+Each mode is fitted in its own child process so the peak resident set sizes do not
+mask each other.
+
+Usage: benchmarks/bench_sparse_memory.py --train=<train> [--alpha=<alpha>]
+
+Options:
+--train=<train>     Path (including filename) to training data (csv, parquet or feather file)
+--alpha=<alpha>     Ridge regularization strength used for the fit [default: 1.0]
+"""
+
+import os
+import resource
+import sys
+import time
+from multiprocessing import get_context
+
+from docopt import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+
+def fit_once(train, sparse, alpha):
+    """
+    Fit the preprocessing + Ridge pipeline once and report its cost
+
+    Parameters
+    ----------
+    train : str
+        path to the training data
+    sparse : bool
+        use the sparse pipeline
+    alpha : float
+        Ridge regularization strength
+
+    Returns
+    -------
+    dict
+        fit time in seconds, design matrix size in bytes and peak RSS in MiB
+    """
+    from sklearn.linear_model import Ridge
+    from sklearn.pipeline import make_pipeline
+    from scipy import sparse as sp
+
+    from data_io import read_data
+    from salary_prediction_model import make_preprocessor
+
+    train_df = read_data(train)
+    X = train_df.drop(columns=["ConvertedComp"])
+    y = train_df["ConvertedComp"]
+
+    start = time.perf_counter()
+    pipe = make_pipeline(make_preprocessor(sparse), Ridge(alpha=alpha, solver="sparse_cg" if sparse else "auto"))
+    pipe.fit(X, y)
+    elapsed = time.perf_counter() - start
+
+    Z = pipe[0].transform(X)
+    nbytes = Z.data.nbytes + Z.indices.nbytes + Z.indptr.nbytes if sp.issparse(Z) else Z.nbytes
+    # ru_maxrss is reported in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"fit_s": elapsed, "matrix_bytes": nbytes, "shape": Z.shape, "peak_rss_mib": peak}
+
+
+def main(train, alpha=1.0):
+    ctx = get_context("spawn")
+    results = {}
+    for name, sparse in [("dense", False), ("sparse", True)]:
+        with ctx.Pool(1) as pool:
+            results[name] = pool.apply(fit_once, (train, sparse, float(alpha)))
+
+    for name, r in results.items():
+        print(f"{name:>6}: shape={r['shape']} matrix={r['matrix_bytes'] / 2 ** 20:.1f} MiB "
+              f"peak_rss={r['peak_rss_mib']:.1f} MiB fit={r['fit_s']:.2f} s")
+    saved = results["dense"]["peak_rss_mib"] - results["sparse"]["peak_rss_mib"]
+    print(f"peak RSS reduction: {saved:.1f} MiB")
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--train"], opt["--alpha"])
@@ -0,0 +1,68 @@
+"""Checks the import time of the pipeline entry points against a budget.
+
+Each module is imported in a fresh interpreter with `python -X importtime` and its
+cumulative import time is read from the last line of the report. The script exits with
+status 1 when any module goes over its budget, so it can run as a CI gate.
+
+Usage: benchmarks/bench_startup.py [--budget_ms=<budget_ms>] [--repeat=<repeat>]
+
+Options:
+--budget_ms=<budget_ms>   Maximum cumulative import time per module in milliseconds [default: 500]
+--repeat=<repeat>         Number of fresh interpreters per module, the fastest counts [default: 3]
+"""
+
+import os
+import subprocess
+import sys
+
+from docopt import docopt
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+MODULES = ["download_data", "preprocessing", "eda", "salary_prediction_model", "predict",
+           "compact_model", "salary_table", "run_pipeline"]
+BUDGET_MS = 500
+# the chart builders need altair at import, so eda gets a larger budget
+BUDGET_OVERRIDES_MS = {"eda": 1500}
+
+
+def import_time_ms(module):
+    """
+    Cumulative import time of `module` in a fresh interpreter
+
+    Parameters
+    ----------
+    module : str
+        the module name, importable from src/
+
+    Returns
+    -------
+    float
+        the import time in milliseconds
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=SRC, capture_output=True, text=True, check=True)
+    # lines look like "import time: self [us] | cumulative | imported package"
+    for line in reversed(result.stderr.splitlines()):
+        fields = [f.strip() for f in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    raise ValueError(f"No import time reported for {module}")
+
+
+def main(budget_ms=BUDGET_MS, repeat=3):
+    over = []
+    for module in MODULES:
+        budget = BUDGET_OVERRIDES_MS.get(module, float(budget_ms))
+        elapsed = min(import_time_ms(module) for _ in range(int(repeat)))
+        status = "ok" if elapsed <= budget else "OVER BUDGET"
+        print(f"{module:>24}: {elapsed:8.1f} / {budget:.0f} ms  {status}")
+        if elapsed > budget:
+            over.append(module)
+    if over:
+        print(f"{len(over)} module(s) over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--budget_ms"], opt["--repeat"])
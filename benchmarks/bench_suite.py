@@ -0,0 +1,173 @@
+"""Benchmarks training, inference and EDA on synthetic surveys of increasing size.
+
+Every measurement runs in a fresh process so its peak RSS is its own. Results are saved
+as json (one record per size and benchmark, plus the environment) and can be compared
+against an earlier run. The models are fitted with the sparse multi-hot encoding by
+default, because the dense one-hot matrix of a million rows does not fit in memory.
+
+Usage: benchmarks/bench_suite.py [--sizes=<sizes>] [--tuning=<tuning>] [--encoding=<encoding>] [--renderer=<renderer>] [--out=<out>] [--compare=<compare>]
+
+Options:
+--sizes=<sizes>         Comma separated numbers of training rows [default: 10000,100000,1000000]
+--tuning=<tuning>       Alpha search used by build_model, "random" or "path" [default: path]
+--encoding=<encoding>   Feature encoding: multi_hot (sparse), sparse (one-hot) or onehot (dense) [default: multi_hot]
+--renderer=<renderer>   Also time PNG rendering of the EDA charts with this eda.py renderer
+--out=<out>             Where the results are written [default: benchmarks/results/latest.json]
+--compare=<compare>     Earlier results file to compare against
+"""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import get_context
+
+from docopt import docopt
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, os.pardir, "src"))
+
+LATENCY_SAMPLES = 200
+
+
+def _peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_fit(rows, tuning, encoding, work_dir):
+    from bench_scaling import ENCODINGS
+    from salary_prediction_model import build_model
+    from synthetic_survey import make_survey
+
+    sparse, multi_hot = ENCODINGS[encoding]
+    train_df = make_survey(rows, seed=1)
+    test_df = make_survey(max(rows // 4, 1), seed=2)
+    start = time.perf_counter()
+    build_model(train_df, work_dir, test_df, sparse=sparse, multi_hot=multi_hot, tuning=tuning)
+    return {"fit_s": time.perf_counter() - start, "peak_rss_mib": _peak_rss_mib()}
+
+
+def bench_predict(rows, work_dir):
+    import numpy as np
+    from joblib import load
+
+    from synthetic_survey import make_survey
+
+    start = time.perf_counter()
+    model = load(os.path.join(work_dir, "best_model_pipe.joblib"))
+    load_s = time.perf_counter() - start
+
+    X = make_survey(rows, seed=3).drop(columns=["ConvertedComp"])
+    start = time.perf_counter()
+    model.predict(X)
+    batch_s = time.perf_counter() - start
+
+    latencies = []
+    for i in range(LATENCY_SAMPLES):
+        start = time.perf_counter()
+        model.predict(X.iloc[i:i + 1])
+        latencies.append(time.perf_counter() - start)
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "load_s": load_s,
+        "throughput_rows_s": rows / batch_s,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "peak_rss_mib": _peak_rss_mib(),
+    }
+
+
+def bench_eda(rows, renderer, work_dir):
+    import eda
+    from synthetic_survey import make_survey
+
+    train_df = make_survey(rows, seed=1).query("ConvertedComp < 200000")
+    start = time.perf_counter()
+    plots = {name: build(train_df) for name, build in eda.CHARTS.items()}
+    result = {"aggregate_s": time.perf_counter() - start}
+    if renderer:
+        result["render_s"] = sum(eda.render(chart, os.path.join(work_dir, name + ".png"), renderer)
+                                 for name, chart in plots.items())
+    result["peak_rss_mib"] = _peak_rss_mib()
+    return result
+
+
+def in_child(func, *args):
+    with get_context("spawn").Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    import numpy
+    import pandas
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "sklearn": sklearn.__version__,
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["benchmark"], r["rows"]): r for r in json.load(f)["results"]}
+    for r in results:
+        old = baseline.get((r["benchmark"], r["rows"]))
+        if old is None:
+            continue
+        for key, value in r.items():
+            if key in ("benchmark", "rows") or not isinstance(value, (int, float)) or not old.get(key):
+                continue
+            print(f"{r['benchmark']:>8} {r['rows']:>8} {key:>18}: {old[key]:.4g} -> {value:.4g} "
+                  f"({value / old[key]:.2f}x)")
+
+
+def save(out, tuning, encoding, env, results):
+    # rewritten after every benchmark, so a crash keeps the results measured so far
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"environment": env, "tuning": tuning, "encoding": encoding, "results": results}, f, indent=2)
+
+
+def main(sizes="10000,100000,1000000", tuning="path", encoding="multi_hot", renderer=None,
+         out="benchmarks/results/latest.json", compare_to=None):
+    env = environment()
+    results = []
+    for rows in [int(s) for s in sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for name, func, args in [
+                ("fit", bench_fit, (rows, tuning, encoding, work_dir)),
+                ("predict", bench_predict, (rows, work_dir)),
+                ("eda", bench_eda, (rows, renderer, work_dir)),
+            ]:
+                try:
+                    record = {"benchmark": name, "rows": rows, **in_child(func, *args)}
+                except Exception as err:
+                    record = {"benchmark": name, "rows": rows, "error": f"{type(err).__name__}: {err}"}
+                print(json.dumps(record))
+                results.append(record)
+                save(out, tuning, encoding, env, results)
+
+    print(f"Saved benchmark results to {out}")
+    if compare_to:
+        compare(results, compare_to)
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--sizes"], opt["--tuning"], opt["--encoding"], opt["--renderer"], opt["--out"], opt["--compare"])
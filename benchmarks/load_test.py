@@ -0,0 +1,62 @@
+"""Load-tests a running prediction server (src/serve.py) from concurrent clients.
+
+Usage: benchmarks/load_test.py [--url=<url>] [--requests=<requests>] [--concurrency=<concurrency>]
+
+Options:
+--url=<url>                  Base url of the server [default: http://127.0.0.1:8000]
+--requests=<requests>        Total number of prediction requests [default: 2000]
+--concurrency=<concurrency>  Number of clients sending requests at the same time [default: 32]
+"""
+
+import json
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from docopt import docopt
+
+DEV_TYPES = ["Developer, back-end", "Developer, front-end", "Developer, full-stack",
+             "Developer, mobile", "Data scientist or machine learning specialist"]
+ED_LEVELS = ["Bachelor’s degree (BA, BS, B.Eng., etc.)", "Master’s degree (MA, MS, M.Eng., MBA, etc.)",
+             "Other doctoral degree (Ph.D, Ed.D., etc.)"]
+LANGUAGES = ["HTML/CSS;JavaScript", "C#;HTML/CSS;JavaScript;SQL", "Python;SQL", "Java;Kotlin"]
+
+
+def random_profile(rng):
+    return {
+        "YearsCodePro": rng.randint(1, 30),
+        "DevType": rng.choice(DEV_TYPES),
+        "EdLevel": rng.choice(ED_LEVELS),
+        "LanguageWorkedWith": rng.choice(LANGUAGES),
+    }
+
+
+def send(url, profile):
+    request = urllib.request.Request(url + "/predict", data=json.dumps(profile).encode(),
+                                     headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def main(url, requests=2000, concurrency=32):
+    rng = random.Random(123)
+    profiles = [random_profile(rng) for _ in range(int(requests))]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(int(concurrency)) as pool:
+        latencies = np.asarray(list(pool.map(lambda p: send(url, p), profiles))) * 1000
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(latencies)} requests in {elapsed:.2f} s ({len(latencies) / elapsed:.0f} req/s)")
+    print(f"client p50={np.percentile(latencies, 50):.1f} ms p99={np.percentile(latencies, 99):.1f} ms")
+    with urllib.request.urlopen(url + "/metrics") as response:
+        print(f"server {json.loads(response.read())}")
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--url"], opt["--requests"], opt["--concurrency"])
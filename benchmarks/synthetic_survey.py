@@ -0,0 +1,168 @@
+"""Generates a synthetic Stack Overflow style survey for offline benchmarks.
+
+Salaries follow a linear model of experience, role, education and languages plus noise,
+so the fitted models behave like the real ones without downloading the survey. Roles and
+languages are real 2019 survey answers, so the EDA charts' filters find rows. Language
+answers are drawn from a fixed pool of combinations, as in the real survey where many
+respondents share the same few stacks, so the one-hot design width does not grow with
+the number of rows.
+
+Usage: benchmarks/synthetic_survey.py --rows=<rows> --out=<out> [--languages=<languages>] [--combinations=<combinations>] [--dev_types=<dev_types>] [--countries=<countries>] [--raw] [--seed=<seed>]
+
+Options:
+--rows=<rows>             Number of respondents
+--out=<out>               Output path (csv, parquet or feather file)
+--languages=<languages>   Size of the language vocabulary [default: 25]
+--combinations=<combinations>  Number of distinct language combinations [default: 500]
+--dev_types=<dev_types>   Number of developer roles [default: 20]
+--countries=<countries>   Country mix of the --raw layout as name:weight pairs [default: Canada:0.5,United States:0.5]
+--raw                     Write the raw survey layout (with Country and Student) instead of the processed one
+--seed=<seed>             Random seed [default: 123]
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from docopt import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+from data_io import write_data  # noqa: E402
+
+ED_LEVELS = [
+    "Bachelor’s degree (BA, BS, B.Eng., etc.)",
+    "Master’s degree (MA, MS, M.Eng., MBA, etc.)",
+    "Other doctoral degree (Ph.D, Ed.D., etc.)",
+    "Some college/university study without earning a degree",
+    "Associate degree",
+    "Secondary school (e.g. American high school, German Realschule or Gymnasium, etc.)",
+]
+
+
+# 2019 answers, most common first
+DEV_TYPES = [
+    "Developer, full-stack", "Developer, back-end", "Developer, front-end",
+    "Developer, desktop or enterprise applications", "Developer, mobile", "DevOps specialist",
+    "Database administrator", "Designer", "System administrator",
+    "Developer, embedded applications or devices", "Data or business analyst",
+    "Data scientist or machine learning specialist", "Developer, QA or test", "Engineer, data",
+    "Academic researcher", "Educator", "Developer, game or graphics", "Engineering manager",
+    "Product manager", "Scientist", "Engineer, site reliability", "Senior executive/VP",
+    "Marketing or sales professional",
+]
+LANGUAGES = [
+    "JavaScript", "HTML/CSS", "SQL", "Python", "Java", "Bash/Shell/PowerShell", "C#", "PHP", "C++",
+    "TypeScript", "C", "Ruby", "Go", "Assembly", "Swift", "Kotlin", "R", "VBA", "Objective-C", "Scala",
+    "Rust", "Dart", "Elixir", "Clojure", "WebAssembly", "F#", "Erlang",
+]
+# the language combinations the EDA charts single out
+COMMON_STACKS = [
+    "HTML/CSS;JavaScript",
+    "C#;HTML/CSS;JavaScript;SQL",
+    "HTML/CSS;JavaScript;PHP;SQL",
+    "Bash/Shell/PowerShell;C#;HTML/CSS;JavaScript;SQL",
+]
+
+
+def answer_names(real, n, synthetic):
+    # the n first real answers, padded with synthetic ones beyond the real list
+    return np.array(real[:n] + [synthetic.format(i) for i in range(len(real), n)], dtype=object)
+
+
+def parse_countries(countries):
+    pairs = [item.split(":") for item in countries.split(",")]
+    names = [name.strip() for name, _ in pairs]
+    weights = np.array([float(w) for _, w in pairs])
+    return names, weights / weights.sum()
+
+
+def make_survey(rows, languages=25, dev_types=20, countries="Canada:0.5,United States:0.5",
+                raw=False, seed=123, combinations=500):
+    """
+    Build a synthetic survey
+
+    Parameters
+    ----------
+    rows : int
+        number of respondents
+    languages : int
+        size of the language vocabulary
+    dev_types : int
+        number of developer roles
+    countries : str
+        country mix as comma separated name:weight pairs, only used with `raw`
+    raw : bool
+        add the Country and Student columns of the raw survey
+    seed : int
+        random seed
+    combinations : int
+        number of distinct language combinations the respondents draw from
+
+    Returns
+    -------
+    dataframe
+        one row per respondent
+    """
+    rng = np.random.default_rng(seed)
+    lang_names = answer_names(LANGUAGES, languages, "Lang{:02d}")
+    role_names = answer_names(DEV_TYPES, dev_types, "Developer, role {:02d}")
+    # answers are joined in alphabetical order, as in the survey
+    alphabetical = np.argsort(lang_names)
+
+    years = rng.integers(1, 41, rows)
+    ed = rng.integers(0, len(ED_LEVELS), rows)
+    role = rng.integers(0, dev_types, rows)
+    # each combination has 1-5 languages, popular ones more often
+    popularity = 1 / np.arange(1, languages + 1)
+    popularity /= popularity.sum()
+    pool = rng.random((combinations, languages)) < np.clip(
+        popularity * rng.integers(1, 6, combinations)[:, None] * 2, 0, 1)
+    pool[np.arange(combinations), rng.choice(languages, combinations, p=popularity)] = True
+    # the most popular stacks are the common real ones
+    index = {name: i for i, name in enumerate(lang_names)}
+    stacks = [stack for stack in COMMON_STACKS if all(name in index for name in stack.split(";"))]
+    for k, stack in enumerate(stacks[:combinations]):
+        pool[k] = False
+        pool[k, [index[name] for name in stack.split(";")]] = True
+    pool_strings = np.array([";".join(lang_names[alphabetical][mask[alphabetical]]) for mask in pool],
+                            dtype=object)
+    # popular stacks are shared by many respondents
+    stack_weights = 1 / np.arange(1, combinations + 1)
+    stack = rng.choice(combinations, rows, p=stack_weights / stack_weights.sum())
+    known = pool[stack]
+    lang_strings = pool_strings[stack]
+
+    salary = (40000 + 2500 * years
+              + rng.normal(0, 8000, dev_types)[role]
+              + rng.normal(0, 6000, len(ED_LEVELS))[ed]
+              + known @ rng.normal(0, 3000, languages)
+              + rng.normal(0, 15000, rows))
+
+    df = pd.DataFrame({
+        "EdLevel": np.array(ED_LEVELS)[ed],
+        "YearsCodePro": years,
+        "LanguageWorkedWith": lang_strings,
+        "DevType": role_names[role],
+        "ConvertedComp": np.clip(salary, 5000, None).round(),
+        "Employment": "Employed full-time",
+    })
+    if raw:
+        names, weights = parse_countries(countries)
+        df.insert(0, "Country", rng.choice(names, rows, p=weights))
+        df["Student"] = "No"
+    return df
+
+
+def main(rows, out, languages=25, dev_types=20, countries="Canada:0.5,United States:0.5", raw=False, seed=123,
+         combinations=500):
+    df = make_survey(int(rows), int(languages), int(dev_types), countries, raw, int(seed), int(combinations))
+    write_data(df, out)
+    print(f"Wrote {len(df)} synthetic respondents to {out}")
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--rows"], opt["--out"], opt["--languages"], opt["--dev_types"], opt["--countries"],
+         opt["--raw"], opt["--seed"], opt["--combinations"])
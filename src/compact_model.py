@@ -0,0 +1,172 @@
+"""Exports the fitted salary pipeline to a compact artifact and predicts from it with NumPy only.
+
+The artifact is a directory holding `weights.npy`, the Ridge coefficient vector in
+design-matrix order (memory-mapped on load), and `meta.json` with the intercept, the
+imputation and scaling parameters of YearsCodePro and, for every categorical column,
+the map from category to its column in the design matrix. Loading it needs neither
+scikit-learn nor pandas.
+
+Usage: src/compact_model.py --model=<model> --out_dir=<out_dir> [--check=<check>]
+
+Options:
+--model=<model>       Path to the serialized model (e.g. results/best_model_pipe.joblib)
+--out_dir=<out_dir>   Directory the compact artifact is written to
+--check=<check>       Data file (csv, parquet or feather) on which both models are compared
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+
+FEATURES = ["YearsCodePro", "DevType", "EdLevel", "LanguageWorkedWith"]
+MISSING = "missing"
+
+
+def _columns(X):
+    # accept a dataframe, a dict of columns or a list of profile dicts
+    if isinstance(X, (list, tuple)):
+        return {col: [row.get(col) for row in X] for col in FEATURES}
+    return {col: list(X[col]) for col in FEATURES}
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class CompactPredictor:
+    """
+    Pure NumPy predictor for a linear model over one scaled numeric feature and
+    one-hot/multi-hot encoded categorical features
+
+    Parameters
+    ----------
+    meta : dict
+        the contents of `meta.json`
+    weights : array
+        the coefficient vector in design-matrix order
+    """
+
+    def __init__(self, meta, weights):
+        self.meta = meta
+        self.weights = weights
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(meta, np.load(os.path.join(path, "weights.npy"), mmap_mode="r"))
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "weights.npy"), np.asarray(self.weights, dtype=np.float64))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    def predict(self, X):
+        columns = _columns(X)
+        n = len(columns[FEATURES[0]])
+        pred = np.full(n, self.meta["intercept"], dtype=np.float64)
+
+        for num in self.meta["numeric"]:
+            values = np.array([np.nan if _is_missing(v) else float(v) for v in columns[num["column"]]])
+            values = np.where(np.isnan(values), num["fill"], values)
+            pred += self.weights[num["index"]] * (values - num["mean"]) / num["scale"]
+
+        for cat in self.meta["categorical"]:
+            index = cat["index"]
+            weights = self.weights
+            for i, value in enumerate(columns[cat["column"]]):
+                if cat["encoding"] == "multihot":
+                    answers = [] if _is_missing(value) else set(str(value).split(cat["sep"]))
+                else:
+                    answers = [MISSING if _is_missing(value) else str(value)]
+                for answer in answers:
+                    j = index.get(answer)
+                    if j is not None:
+                        pred[i] += weights[j]
+        return pred
+
+
+def export(search):
+    """
+    Flatten a fitted search (or pipeline) into a `CompactPredictor`
+
+    Parameters
+    ----------
+    search : RandomizedSearchCV, RidgePathSearch or Pipeline
+        the model written by `build_model`
+
+    Returns
+    -------
+    CompactPredictor
+        the flattened model
+    """
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    from multi_hot import MultiHotEncoder
+
+    pipe = getattr(search, "best_estimator_", search)
+    preprocessor, ridge = pipe[0], pipe[-1]
+    meta = {"intercept": float(ridge.intercept_), "numeric": [], "categorical": []}
+    offset = 0
+
+    for name, transformer, cols in preprocessor.transformers_:
+        if transformer == "drop" or name == "remainder":
+            continue
+        last = transformer[-1] if isinstance(transformer, Pipeline) else transformer
+        if isinstance(last, StandardScaler):
+            imputer = transformer[0]
+            for k, col in enumerate(cols):
+                meta["numeric"].append({
+                    "column": col, "index": offset,
+                    "fill": float(imputer.statistics_[k]),
+                    "mean": float(last.mean_[k]), "scale": float(last.scale_[k]),
+                })
+                offset += 1
+        elif isinstance(last, OneHotEncoder):
+            for col, categories in zip(cols, last.categories_):
+                index = {str(c): offset + j for j, c in enumerate(categories)}
+                meta["categorical"].append({"column": col, "encoding": "onehot", "index": index})
+                offset += len(categories)
+        elif isinstance(last, MultiHotEncoder):
+            for col, vocabulary in zip(cols, last.vocabularies_):
+                index = {answer: offset + j for j, answer in enumerate(vocabulary)}
+                meta["categorical"].append({"column": col, "encoding": "multihot",
+                                            "sep": last.sep, "index": index})
+                offset += len(vocabulary)
+        else:
+            raise ValueError(f"Cannot export transformer {name!r} of type {type(last).__name__}")
+
+    weights = np.asarray(ridge.coef_, dtype=np.float64).ravel()
+    if offset != len(weights):
+        raise ValueError(f"Exported {offset} columns but the model has {len(weights)} coefficients")
+    return CompactPredictor(meta, weights)
+
+
+def main(model, out_dir, check=None):
+    from joblib import load
+
+    search = load(model)
+    compact = export(search)
+    compact.save(out_dir)
+    print(f"Saved compact model to {out_dir}")
+
+    if check:
+        from data_io import read_data
+
+        df = read_data(check)
+        expected = search.predict(df[FEATURES])
+        actual = CompactPredictor.load(out_dir).predict(df)
+        print(f"Max absolute difference on {len(df)} rows: {np.max(np.abs(expected - actual)):.3g}")
+        if not np.allclose(expected, actual):
+            raise ValueError("Compact model does not match the serialized pipeline")
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    opt = docopt(__doc__)
+    main(opt["--model"], opt["--out_dir"], opt["--check"])
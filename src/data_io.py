@@ -0,0 +1,82 @@
+"""Reads and writes the processed training and test data.
+
+The format is picked from the file extension: `.csv`, `.parquet` or `.feather`. The
+columnar formats store `DevType`, `EdLevel` and `LanguageWorkedWith` dictionary encoded,
+so downstream stages load typed columns without re-parsing text.
+"""
+
+import os
+
+CATEGORICAL_COLUMNS = ["DevType", "EdLevel", "LanguageWorkedWith", "Employment"]
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+
+def data_format(path):
+    """
+    Return the format name of `path` from its extension
+
+    Parameters
+    ----------
+    path : str
+        path of a data file
+
+    Returns
+    -------
+    str
+        one of the keys of `FORMATS`
+    """
+    ext = os.path.splitext(path)[1].lower()
+    for name, suffix in FORMATS.items():
+        if ext == suffix:
+            return name
+    raise ValueError(f"Unsupported data file extension: {path}")
+
+
+def read_data(path, columns=None):
+    """
+    Read a processed data file in any of the supported formats
+
+    Parameters
+    ----------
+    path : str
+        path of the data file
+    columns : list of str, optional
+        only read these columns
+
+    Returns
+    -------
+    dataframe
+        the data
+    """
+    import pandas as pd
+
+    fmt = data_format(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+    if fmt == "feather":
+        return pd.read_feather(path, columns=columns, use_threads=True)
+    return pd.read_csv(path, usecols=columns)
+
+
+def write_data(df, path):
+    """
+    Write `df` to `path`, dictionary encoding the categorical columns in columnar formats
+
+    Parameters
+    ----------
+    df : dataframe
+        the data to write
+    path : str
+        destination, whose extension selects the format
+    """
+    fmt = data_format(path)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+        return
+    df = df.reset_index(drop=True).astype(
+        {col: "category" for col in CATEGORICAL_COLUMNS if col in df.columns}
+    )
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_feather(path)
@@ -3,30 +3,375 @@
 
 """Downloads data csv data from the web to a local filepath as a csv file format.
 
-Usage: src/download_data.py --url=<url> --out_dir=<out_file>
+Usage: src/download_data.py --url=<url> --out_dir=<out_file> [--stream] [--sha256=<sha256>] [--chunk_size=<chunk_size>] [--cache_dir=<cache_dir>] [--cache_size=<cache_size>]
 
 Options:
---url=<url>              URL from where to download the data (must be in standard csv format)
---out_dir=<out_file>     Directory where the extracted file will be saved
+--url=<url>                  URL from where to download the data (must be in standard csv format)
+--out_dir=<out_file>         Directory where the extracted file will be saved
+--stream                     Stream the archive to disk in chunks (resumable) instead of holding it in memory
+--sha256=<sha256>            Expected SHA-256 hex digest of the downloaded archive
+--chunk_size=<chunk_size>    Chunk size in bytes used when streaming [default: 1048576]
+--cache_dir=<cache_dir>      Directory of a content-addressed archive cache shared between runs
+--cache_size=<cache_size>    Maximum size in bytes of the archive cache [default: 2147483648]
 """
-  
-from docopt import docopt
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+import shutil
+import sys
 import zipfile
-import requests
 from io import BytesIO
 
-opt = docopt(__doc__)
+import requests
+from docopt import docopt
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from instrument import stage
+
+MEMBER = "survey_results_public.csv"
+CHUNK_SIZE = 1024 * 1024
+CACHE_SIZE = 2 * 1024 ** 3
+
+def sha256sum(path, chunk_size=CHUNK_SIZE):
+    """
+    Compute the SHA-256 hex digest of a file without reading it all at once
+
+    Parameters
+    ----------
+    path : str
+        path of the file to hash
+    chunk_size : int
+        number of bytes read per iteration
+
+    Returns
+    -------
+    str
+        the hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _validator(response):
+    # a strong ETag, or failing that Last-Modified, identifies the version of the remote file
+    etag = response.headers.get("ETag", "")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified", "")
+
+
+def stream_to_file(url, path, chunk_size=CHUNK_SIZE, session=None):
+    """
+    Stream `url` to `path` chunk by chunk, resuming a partial download
+
+    A partial file is kept next to `path` with a `.part` suffix, and the ETag
+    (or Last-Modified) of the response it came from in a `.part.validator`
+    file. A partial file is only resumed with a range request carrying that
+    validator in `If-Range`, so if the remote file has changed the server sends
+    it in full and the download restarts from scratch.
+
+    Parameters
+    ----------
+    url : str
+        the url to download
+    path : str
+        where the complete file is written
+    chunk_size : int
+        number of bytes held in memory at any time
+    session : requests.Session, optional
+        session whose connection pool is reused for the request
+
+    Returns
+    -------
+    str
+        the path of the downloaded file
+    """
+    part = path + ".part"
+    validator_path = part + ".validator"
+    validator = None
+    if os.path.exists(part) and os.path.exists(validator_path):
+        with open(validator_path) as f:
+            validator = f.read().strip() or None
+    offset = os.path.getsize(part) if validator else 0
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+
+    http = session or requests
+    with http.get(url, headers=headers, stream=True, timeout=60) as response:
+        if response.status_code == 416:
+            # with If-Range, a 416 means the same version is complete if the sizes agree
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if offset and total == str(offset):
+                os.replace(part, path)
+                os.remove(validator_path)
+                return path
+            for stale in (part, validator_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            return stream_to_file(url, path, chunk_size, session)
+        response.raise_for_status()
+        resume = offset and response.status_code == 206
+        if not resume:
+            with open(validator_path, "w") as f:
+                f.write(_validator(response))
+        with open(part, "ab" if resume else "wb") as f:
+            for block in response.iter_content(chunk_size=chunk_size):
+                f.write(block)
+
+    os.replace(part, path)
+    os.remove(validator_path)
+    return path
+
+
+def extract_member(archive, out_dir, member=MEMBER, chunk_size=CHUNK_SIZE):
+    """
+    Extract a single member of a zip archive to `out_dir` in chunks
+
+    Parameters
+    ----------
+    archive : str or file-like
+        the zip archive
+    out_dir : str
+        the directory in which the member is written
+    member : str
+        name of the member inside the archive
+    chunk_size : int
+        number of bytes copied per iteration
+
+    Returns
+    -------
+    str
+        the path of the extracted file
+    """
+    target = os.path.join(out_dir, os.path.basename(member))
+    with zipfile.ZipFile(archive) as zip_ref:
+        with zip_ref.open(member) as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, chunk_size)
+    return target
+
+
+def download_streaming(url, out_dir, sha256=None, chunk_size=CHUNK_SIZE):
+    """
+    Download the survey archive to disk with bounded memory and extract the csv
+
+    Parameters
+    ----------
+    url : str
+        the url of the zip archive
+    out_dir : str
+        the directory in which the csv is written
+    sha256 : str, optional
+        expected SHA-256 hex digest of the archive
+    chunk_size : int
+        number of bytes held in memory at any time
 
-def main(url, out_dir):
-    
+    Returns
+    -------
+    str
+        the path of the extracted csv
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    archive = os.path.join(out_dir, os.path.basename(url.split("?")[0]) or "survey.zip")
+    stream_to_file(url, archive, chunk_size)
+
+    if sha256 and sha256sum(archive, chunk_size) != sha256.lower():
+        os.remove(archive)
+        raise ValueError(f"Checksum mismatch for {url}")
+
+    target = extract_member(archive, out_dir, MEMBER, chunk_size)
+    os.remove(archive)
+    return target
+
+
+def cache_key(url, session=None):
+    """
+    Build the cache key of `url` from the url and its ETag/Last-Modified headers
+
+    Parameters
+    ----------
+    url : str
+        the url of the archive
+    session : requests.Session, optional
+        session whose connection pool is reused for the request
+
+    Returns
+    -------
+    str
+        a hex digest identifying this version of the remote archive
+    """
+    response = (session or requests).head(url, allow_redirects=True, timeout=60)
+    etag = response.headers.get("ETag", "")
+    modified = response.headers.get("Last-Modified", "")
+    return hashlib.sha256(f"{url}\n{etag}\n{modified}".encode()).hexdigest()
+
+
+@contextlib.contextmanager
+def _locked(path):
+    # an exclusive file lock serializes the jobs sharing the cache, not just threads
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                # msvcrt gives up after 10 s of waiting, keep waiting as flock does
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_index(cache_dir):
     try:
+        with open(os.path.join(cache_dir, "index.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"keys": {}, "objects": {}}
+
+
+def _write_index(cache_dir, index):
+    # write-then-rename so concurrent jobs never observe a half-written index
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, os.path.join(cache_dir, "index.json"))
+
+
+def evict(cache_dir, index, max_size=CACHE_SIZE, keep=None):
+    """
+    Remove least recently used archives until the cache fits in `max_size` bytes
+
+    Parameters
+    ----------
+    cache_dir : str
+        the cache directory
+    index : dict
+        the cache index, updated in place
+    max_size : int
+        maximum total size of the cached archives in bytes
+    keep : str, optional
+        digest of an archive that is in use and must not be evicted
+    """
+    objects = index["objects"]
+    total = sum(obj["size"] for obj in objects.values())
+    for digest in sorted(objects, key=lambda d: objects[d]["last_used"]):
+        if total <= max_size:
+            break
+        if digest == keep:
+            continue
+        total -= objects.pop(digest)["size"]
+        try:
+            os.remove(os.path.join(cache_dir, "objects", digest + ".zip"))
+        except FileNotFoundError:
+            pass
+    index["keys"] = {k: d for k, d in index["keys"].items() if d in objects}
+
+
+def cached_archive(url, cache_dir, sha256=None, chunk_size=CHUNK_SIZE, max_size=CACHE_SIZE,
+                   session=None):
+    """
+    Return the path of a cached copy of the archive at `url`, downloading it if needed
+
+    Archives are stored under their SHA-256 digest, so identical bytes served
+    from different urls or versions are kept once. The index maps the
+    url/ETag/Last-Modified key to that digest and records when each archive
+    was last used for LRU eviction.
+
+    Parameters
+    ----------
+    url : str
+        the url of the zip archive
+    cache_dir : str
+        the cache directory
+    sha256 : str, optional
+        expected SHA-256 hex digest of the archive
+    chunk_size : int
+        number of bytes held in memory at any time
+    max_size : int
+        maximum total size of the cached archives in bytes
+    session : requests.Session, optional
+        session whose connection pool is reused for the requests
+
+    Returns
+    -------
+    str
+        the path of the cached archive
+    """
+    objects_dir = os.path.join(cache_dir, "objects")
+    os.makedirs(objects_dir, exist_ok=True)
+    index_lock = os.path.join(cache_dir, "index.lock")
+    key = cache_key(url, session)
+
+    # one job downloads a given key at a time; the others wait and then find it cached
+    with _locked(os.path.join(cache_dir, key + ".lock")):
+        with _locked(index_lock):
+            digest = _read_index(cache_dir)["keys"].get(key)
+        path = os.path.join(objects_dir, f"{digest}.zip") if digest else None
+        if path is None or not os.path.exists(path) or (sha256 and digest != sha256.lower()):
+            # the partial file is named after the key so a rerun resumes it
+            tmp = stream_to_file(url, os.path.join(cache_dir, key + ".download"), chunk_size, session)
+            digest = sha256sum(tmp, chunk_size)
+            if sha256 and digest != sha256.lower():
+                os.remove(tmp)
+                raise ValueError(f"Checksum mismatch for {url}")
+            path = os.path.join(objects_dir, f"{digest}.zip")
+            os.replace(tmp, path)
+
+        with _locked(index_lock):
+            index = _read_index(cache_dir)
+            index["keys"][key] = digest
+            index["objects"][digest] = {"size": os.path.getsize(path), "last_used": time.time()}
+            evict(cache_dir, index, max_size, keep=digest)
+            _write_index(cache_dir, index)
+    return path
+
+
+def main(url, out_dir, stream=False, sha256=None, chunk_size=CHUNK_SIZE,
+         cache_dir=None, cache_size=CACHE_SIZE):
+
+    try:
+        if cache_dir:
+            archive = cached_archive(url, cache_dir, sha256, int(chunk_size), int(cache_size))
+            os.makedirs(out_dir, exist_ok=True)
+            extract_member(archive, out_dir, MEMBER, int(chunk_size))
+            return
+        if stream:
+            download_streaming(url, out_dir, sha256, int(chunk_size))
+            return
         request = requests.get(url)
-        request.status_code == 200
-        with zipfile.ZipFile(BytesIO(request.content)) as zip_ref:
-            zip_ref.extract("survey_results_public.csv", out_dir)
-    except Exception as req:
+        request.raise_for_status()
+    except requests.RequestException as req:
         print("Website at the provided url does not exist.")
         print(req)
+        sys.exit(1)
+    if sha256 and hashlib.sha256(request.content).hexdigest() != sha256.lower():
+        raise ValueError(f"Checksum mismatch for {url}")
+    with zipfile.ZipFile(BytesIO(request.content)) as zip_ref:
+        zip_ref.extract(MEMBER, out_dir)
+
 
 if __name__ == "__main__":
-    main(opt["--url"], opt["--out_dir"])
\ No newline at end of file
+    opt = docopt(__doc__)
+    with stage("download"):
+        main(opt["--url"], opt["--out_dir"], opt["--stream"], opt["--sha256"], opt["--chunk_size"],
+             opt["--cache_dir"], opt["--cache_size"])
@@ -1,112 +1,349 @@
 # author: Jiwei Hu
 # date: 2021-11-24
 
-#Usage # create exploratory data analysis figures and write to file 
+#Usage # create exploratory data analysis figures and write to file
 #python src/eda.py --train=data/processed/training.csv --out_dir=results/
 
 '''Creates eda charts and plots for the pre-processed training data from the Stack Overflow Annual Developer Survey 2019 data (from https://info.stackoverflowsolutions.com/rs/719-EMH-566/images/stack-overflow-developer-survey-2019.zip).
 Saves the plots as a pdf and png file.
-Usage: src/eda.py --train=<train> --out_dir=<out_dir>
-  
+Usage: src/eda.py --train=<train> --out_dir=<out_dir> [--charts=<charts>] [--workers=<workers>] [--renderer=<renderer>]
+
 Options:
---train=<train>     Path (including filename) to training data (which needs to be saved as a csv file)
+--train=<train>     Path (including filename) to training data (csv, parquet or feather file)
 --out_dir=<out_dir> Path to directory where the plots should be saved
+--charts=<charts>   Comma separated charts to build, from edu_plot, role_plot, language_plot, code_years_plot, salary_density_plot, language_codeyears_plot [default: all]
+--workers=<workers> Number of charts rendered at the same time by the browser based renderers [default: 6]
+--renderer=<renderer> How PNGs are produced: "auto" (altair_saver, usually a Selenium browser), "node" (vega-cli, no browser) or "vl-convert" (in-process, no browser) [default: auto]
 '''
 
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from docopt import docopt
 import numpy as np
 import pandas as pd
 import altair as alt
-from altair_saver import save
-alt.data_transformers.enable('data_server')
-alt.renderers.enable('mimetype')
 
-opt = docopt(__doc__)
+from data_io import read_data
+from instrument import phase, stage
+
+KDE_STEPS = 200
+KDE_BINS = 2048
+
+
+def box_summary(df, group, value='ConvertedComp'):
+    """
+    Compute the boxplot statistics of `value` per `group` in pandas
+
+    Whiskers follow the Vega-Lite default: the most extreme values within 1.5 IQR
+    of the quartiles.
+
+    Parameters
+    ----------
+    df : dataframe
+        the rows to summarize
+    group : str
+        the column the boxes are drawn for
+    value : str
+        the numeric column summarized
+
+    Returns
+    -------
+    dataframe
+        one row per group with lower, q1, median, q3 and upper
+    """
+    if df[value].notna().sum() == 0:
+        # nothing to summarize, the chart is drawn empty
+        return pd.DataFrame(columns=[group, 'q1', 'median', 'q3', 'lower', 'upper'])
+    grouped = df.groupby(group, observed=True)[value]
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'median', 'q3']
+    iqr = stats['q3'] - stats['q1']
+    bounds = df[[group, value]].join(stats[['q1', 'q3']].assign(iqr=iqr), on=group)
+    inside = bounds[(bounds[value] >= bounds['q1'] - 1.5 * bounds['iqr'])
+                    & (bounds[value] <= bounds['q3'] + 1.5 * bounds['iqr'])]
+    stats['lower'] = inside.groupby(group, observed=True)[value].min()
+    stats['upper'] = inside.groupby(group, observed=True)[value].max()
+    return stats.reset_index().astype({group: str})
+
+
+def box_outliers(df, summary, group, value='ConvertedComp'):
+    """
+    The rows beyond the whiskers of `box_summary`, drawn as points like Vega-Lite does
+
+    Parameters
+    ----------
+    df : dataframe
+        the summarized rows
+    summary : dataframe
+        the output of `box_summary` for `df`
+    group : str
+        the grouping column
+    value : str
+        the numeric column summarized
+
+    Returns
+    -------
+    dataframe
+        the group and value of every outlier
+    """
+    if summary.empty:
+        return pd.DataFrame(columns=[group, value])
+    rows = df[[group, value]].astype({group: str}).join(summary.set_index(group)[['lower', 'upper']], on=group)
+    outside = (rows[value] < rows['lower']) | (rows[value] > rows['upper'])
+    return rows.loc[outside, [group, value]].reset_index(drop=True)
+
+
+def boxplot_chart(summary, group, y_title, outliers=None, value='ConvertedComp'):
+    """
+    Draw precomputed boxplot statistics as whisker rules, quartile bars, median ticks
+    and outlier points
 
-def main(train, out_dir):
-    # read in data
-    train_df = pd.read_csv(train)
+    Parameters
+    ----------
+    summary : dataframe
+        the output of `box_summary`
+    group : str
+        the grouping column
+    y_title : str
+        the title of the y axis
+    outliers : dataframe, optional
+        the output of `box_outliers`
+    value : str
+        the value column of `outliers`
 
+    Returns
+    -------
+    altair.LayerChart
+        the boxplot
+    """
+    base = alt.Chart(summary).encode(
+        alt.Y(f'{group}:N', title=y_title),
+        color=f'{group}:N',
+        )
+    whiskers = base.mark_rule().encode(
+        alt.X('lower:Q', title='Annual Compensation(USD)'),
+        alt.X2('upper:Q'),
+        )
+    boxes = base.mark_bar(size=14).encode(alt.X('q1:Q'), alt.X2('q3:Q'))
+    medians = base.mark_tick(color='white', size=14).encode(alt.X('median:Q'))
+    if outliers is None:
+        return alt.layer(whiskers, boxes, medians)
+    points = alt.Chart(outliers).mark_point().encode(
+        alt.X(f'{value}:Q'),
+        alt.Y(f'{group}:N', title=y_title),
+        color=f'{group}:N',
+        )
+    return alt.layer(whiskers, boxes, medians, points)
+
+
+def box_chart(df, group, y_title):
+    # the Vega-Lite boxplot of ConvertedComp per group, aggregated in pandas
+    summary = box_summary(df, group)
+    return boxplot_chart(summary, group, y_title, box_outliers(df, summary, group))
+
+
+def kde(values, steps=KDE_STEPS, bins=KDE_BINS):
+    """
+    Gaussian kernel density estimate with Vega's bandwidth, computed on a binned grid
+
+    The bandwidth follows Vega's density transform, 1.06 * min(std, IQR / 1.34) * n^(-1/5).
+    The values are histogrammed into `bins` bins and the histogram is convolved with
+    the kernel, so the cost does not grow with the number of rows.
+
+    Parameters
+    ----------
+    values : array-like
+        the sample
+    steps : int
+        number of points the density is evaluated at
+    bins : int
+        number of histogram bins the sample is reduced to
+
+    Returns
+    -------
+    dataframe
+        `steps` rows of the evaluation points and their density
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return pd.DataFrame({'ConvertedComp': [], 'Density': []})
+    std = values.std(ddof=1) if len(values) > 1 else 0.0
+    q1, q3 = np.percentile(values, [25, 75])
+    # the same fallbacks as Vega when the spread is zero
+    spread = min(std, (q3 - q1) / 1.34) or std or abs(q1) or 1.0
+    bandwidth = 1.06 * spread * len(values) ** (-1 / 5)
+    counts, edges = np.histogram(values, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    grid = np.linspace(values.min(), values.max(), steps)
+    weights = np.exp(-0.5 * ((grid[:, None] - centers[None, :]) / bandwidth) ** 2)
+    density = weights @ counts / (len(values) * bandwidth * np.sqrt(2 * np.pi))
+    return pd.DataFrame({'ConvertedComp': grid, 'Density': density})
+
+
+def edu_plot(train_df):
     # visualize the annual compensation comparision by different education levels
-    
-    train_df = train_df.query('ConvertedComp < 200000')
     replace_dict = {'Bachelor’s degree (BA, BS, B.Eng., etc.)':'Bachelor',
             'Master’s degree (MA, MS, M.Eng., MBA, etc.)':'Master',
             'Other doctoral degree (Ph.D, Ed.D., etc.)':'PH.D.'}
-    edu_df = train_df[train_df["EdLevel"].astype(str).str.contains('Bachelor|Master|doctoral')].replace(replace_dict)
-    
+    edu_df = train_df[train_df["EdLevel"].astype(str).str.contains('Bachelor|Master|doctoral')]
+    edu_df = edu_df.astype({'EdLevel': str}).replace({'EdLevel': replace_dict})
 
-    edu_plot = alt.Chart(edu_df).mark_boxplot().encode(
-        y = alt.Y('EdLevel:N', title='Education level'), 
-        x = alt.X('ConvertedComp:Q', title='Annual Compensation(USD)'),
-        color='EdLevel',
-        )
-    
-     # visualize the annual compensation comparision by different job types  
+    return box_chart(edu_df, 'EdLevel', 'Education level')
+
+
+def role_plot(train_df):
+    # visualize the annual compensation comparision by different job types
     role_df = train_df[train_df["DevType"].astype(str).str.contains('full-stack|front-end|back-end|desktop|mobile')]
 
+    return box_chart(role_df, 'DevType', 'Job type')
 
-    role_plot = alt.Chart(role_df).mark_boxplot().encode(
-        alt.Y('DevType:N', title='Job type'), 
-        alt.X('ConvertedComp:Q', title='Annual Compensation(USD)'),
-        color='DevType:N',
-        )
 
-    # visualize the annual compensation comparision versus different coding years group by programming languages
+def tech_data(train_df):
+    # the most common language combinations, with shorter labels
     tech = ['C#;HTML/CSS;JavaScript;SQL', 'HTML/CSS;JavaScript', 'HTML/CSS;JavaScript;PHP;SQL', 'Bash/Shell/PowerShell;C#;HTML/CSS;JavaScript;SQL']
-    tech_df = train_df.query('LanguageWorkedWith == @tech')
+    tech_df = train_df[train_df['LanguageWorkedWith'].isin(tech)].astype({'LanguageWorkedWith': str})
     lang_replace_dict = {'C#;HTML/CSS;JavaScript;SQL':'C,SQL,HTML,Java',
             'HTML/CSS;JavaScript':'HTML,Java',
             'HTML/CSS;JavaScript;PHP;SQL':'HTML,Java,PHP,SQL',
             'Bash/Shell/PowerShell;C#;HTML/CSS;JavaScript;SQL':'Bash,C,SQL,HTML,Java',
                }
-    tech_df = tech_df.replace(lang_replace_dict)
+    return tech_df.replace({'LanguageWorkedWith': lang_replace_dict})
 
-    language_codeyears_plot = alt.Chart(tech_df).mark_rect().encode(
-        alt.Y('LanguageWorkedWith:N', title='Languages worked with'), 
+
+def language_codeyears_plot(train_df):
+    # visualize the annual compensation comparision versus different coding years group by programming languages
+    means = (tech_data(train_df)
+             .groupby(['LanguageWorkedWith', 'YearsCodePro'], observed=True)['ConvertedComp']
+             .mean().reset_index())
+    return alt.Chart(means).mark_rect().encode(
+        alt.Y('LanguageWorkedWith:N', title='Languages worked with'),
         alt.X('YearsCodePro:N', title='Number of professional coding years', axis=alt.Axis(labelAngle=0)),
-        alt.Color('mean(ConvertedComp)', title='Average annual compensation')
+        alt.Color('ConvertedComp:Q', title='Average annual compensation')
         )
 
+
+def language_plot(train_df):
     # visualize the annual compensation comparision between different programming languages
-    language_plot = alt.Chart(tech_df).mark_boxplot().encode(
-        alt.Y('LanguageWorkedWith:N', title='Languages worked with'), 
-        alt.X('ConvertedComp:Q', title='Annual Compensation(USD)'),
-        color='LanguageWorkedWith:N',
-        )
+    return box_chart(tech_data(train_df), 'LanguageWorkedWith', 'Languages worked with')
+
 
+def code_years_plot(train_df):
     # visualize the annual compensation comparision by different codeing experience years
 
     # code_years_df = (train_df.query("YearsCodePro != 'Less than 1 year' and YearsCodePro != 'More than 50 years' ")
     #              .dropna(subset=["YearsCodePro", "ConvertedComp", "DevType"]).astype({"YearsCodePro": "int"})
     #              .query("YearsCodePro <= 30"))
-    code_years_df = train_df.query("YearsCodePro <= 30")
+    code_years_df = (train_df.query("YearsCodePro <= 30")
+                     .groupby('YearsCodePro')['ConvertedComp'].mean().reset_index())
 
-
-    code_years_plot = alt.Chart(code_years_df).mark_point(
-        ).encode(alt.X('YearsCodePro',title='Number of professional coding years'), 
-         alt.Y('mean(ConvertedComp)', title='Annual Compensation(USD)'), 
+    return alt.Chart(code_years_df).mark_point(
+        ).encode(alt.X('YearsCodePro',title='Number of professional coding years'),
+         alt.Y('ConvertedComp', title='Annual Compensation(USD)'),
         )
-    
-    # visualize the salary distribution 
-    salary_density_plot = (alt.Chart(train_df)
-        .transform_density(
-        'ConvertedComp',
-         as_=['ConvertedComp', 'Density'])  # Give the name "density" the KDE columns we just created
+
+
+def salary_density_plot(train_df):
+    # visualize the salary distribution
+    return (alt.Chart(kde(train_df['ConvertedComp']))
         .mark_area(opacity=0.8).encode(
         x=alt.X('ConvertedComp', title='Annual Compensation(USD)'),
         y='Density:Q'))
-    
-    # save all the plots in the out_dir
-    
-    save(edu_plot,out_dir + 'edu_plot.png')
-    save(role_plot,out_dir + 'role_plot.png')
-    save(language_plot,out_dir + 'language_plot.png')
-    save(code_years_plot,out_dir + 'code_years_plot.png')
-    save(salary_density_plot,out_dir + 'salary_density_plot.png')
-    save(language_codeyears_plot,out_dir + 'language_codeyears_plot.png')
 
 
+CHARTS = {
+    "edu_plot": edu_plot,
+    "role_plot": role_plot,
+    "language_plot": language_plot,
+    "code_years_plot": code_years_plot,
+    "salary_density_plot": salary_density_plot,
+    "language_codeyears_plot": language_codeyears_plot,
+}
+
+
+RENDERERS = ["auto", "node", "vl-convert"]
+
+
+def render(chart, path, renderer="auto"):
+    """
+    Save `chart` as a PNG and return how long it took
+
+    Parameters
+    ----------
+    chart : altair.Chart
+        the chart to save
+    path : str
+        the PNG file to write
+    renderer : str
+        "auto" lets altair_saver pick (usually a Selenium driven browser), "node"
+        uses the vega-cli tools and "vl-convert" renders in this process
+
+    Returns
+    -------
+    float
+        the render time in seconds
+    """
+    start = time.perf_counter()
+    if renderer == "vl-convert":
+        import vl_convert as vlc
+
+        # inline the (already aggregated) data so the renderer needs no data server
+        with alt.data_transformers.enable('default'):
+            spec = chart.to_dict()
+        with open(path, 'wb') as f:
+            f.write(vlc.vegalite_to_png(spec, scale=1))
+    else:
+        # altair_saver pulls in selenium and starts browser tooling, so import it on demand
+        from altair_saver import save
+
+        if renderer == "node":
+            save(chart, path, method='node')
+        else:
+            save(chart, path)
+    return time.perf_counter() - start
+
+
+def main(train, out_dir, charts="all", workers=6, renderer="auto"):
+    names = list(CHARTS) if charts in (None, "all") else [c.strip() for c in charts.split(",")]
+    unknown = set(names) - set(CHARTS)
+    if unknown:
+        raise ValueError(f"Unknown charts: {', '.join(sorted(unknown))}")
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unknown renderer {renderer!r}, expected one of {', '.join(RENDERERS)}")
+
+    # enabled here rather than at import so importing the chart builders stays cheap
+    alt.data_transformers.enable('data_server')
+    alt.renderers.enable('mimetype')
+
+    with stage("eda") as st:
+        # read in data once for every chart
+        with phase("read") as p:
+            train_df = read_data(train)
+            train_df = train_df.query('ConvertedComp < 200000')
+            p.rows_out = len(train_df)
+        with phase("aggregate", rows_in=len(train_df)):
+            plots = {name: CHARTS[name](train_df) for name in names}
+
+        # save all the plots in the out_dir; the in-process renderer is reused for every
+        # plot, the browser based ones each launch a browser so they run in a pool
+        workers = 1 if renderer == "vl-convert" else min(int(workers), len(plots))
+        with phase("render"):
+            if workers <= 1:
+                timings = {name: render(chart, os.path.join(out_dir, name + '.png'), renderer)
+                           for name, chart in plots.items()}
+            else:
+                with ProcessPoolExecutor(workers) as pool:
+                    futures = {name: pool.submit(render, chart, os.path.join(out_dir, name + '.png'), renderer)
+                               for name, chart in plots.items()}
+                    timings = {name: future.result() for name, future in futures.items()}
+        st.rows_in = len(train_df)
+
+    for name, elapsed in timings.items():
+        print(f"{name}: {elapsed:.2f} s")
+
 
 if __name__ == "__main__":
-    main(opt["--train"], opt["--out_dir"])
\ No newline at end of file
+    opt = docopt(__doc__)
+    main(opt["--train"], opt["--out_dir"], opt["--charts"], opt["--workers"], opt["--renderer"])
@@ -0,0 +1,158 @@
+"""Downloads several editions of the Stack Overflow survey concurrently and writes them
+with one column schema, partitioned by survey year.
+
+Each partition holds the columns preprocessing.py reads (plus `Year`), renamed and
+recoded to the 2019 answers: later editions renamed the salary and language columns,
+dropped `Student` (it is derived from `Employment`) and reworded some answers.
+preprocessing.py accepts the output directory as its `--input`.
+
+Usage: src/ingest_surveys.py --manifest=<manifest> --out_dir=<out_dir> [--workers=<workers>] [--cache_dir=<cache_dir>] [--chunk_size=<chunk_size>]
+
+Options:
+--manifest=<manifest>        Path to a json list of {"year", "url"[, "member", "sha256"]} entries
+--out_dir=<out_dir>          Directory where the year=<year>/ partitions will be written
+--workers=<workers>          Number of survey editions processed at the same time [default: 4]
+--cache_dir=<cache_dir>      Directory of the archive cache shared with download_data.py
+--chunk_size=<chunk_size>    Chunk size in bytes used when streaming [default: 1048576]
+"""
+
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from docopt import docopt
+
+from download_data import MEMBER, CHUNK_SIZE, cached_archive, extract_member, sha256sum, stream_to_file
+from preprocessing import COLUMNS
+
+# later survey editions renamed some of the columns used by the pipeline
+COLUMN_MAP = {
+    "ConvertedCompYearly": "ConvertedComp",
+    "LanguageHaveWorkedWith": "LanguageWorkedWith",
+}
+# answers reworded after 2019, mapped back to the 2019 wording
+ANSWER_MAP = {
+    "Employment": {
+        "Employed, full-time": "Employed full-time",
+        "Employed, part-time": "Employed part-time",
+    },
+    "EdLevel": {
+        "Bachelor’s degree (B.A., B.S., B.Eng., etc.)": "Bachelor’s degree (BA, BS, B.Eng., etc.)",
+        "Master’s degree (M.A., M.S., M.Eng., MBA, etc.)": "Master’s degree (MA, MS, M.Eng., MBA, etc.)",
+        "Other doctoral degree (Ph.D., Ed.D., etc.)": "Other doctoral degree (Ph.D, Ed.D., etc.)",
+        "Associate degree (A.A., A.S., etc.)": "Associate degree",
+    },
+}
+ROWS_PER_CHUNK = 20000
+
+
+def normalize_columns(df, year):
+    """
+    Bring the columns of one survey edition to the 2019 schema and tag the year
+
+    Parameters
+    ----------
+    df : dataframe
+        rows of one survey edition
+    year : int
+        the survey year
+
+    Returns
+    -------
+    dataframe
+        the `COLUMNS` of preprocessing.py, with 2019 answers, and a `Year` column
+    """
+    df = df.rename(columns={old: new for old, new in COLUMN_MAP.items() if new not in df.columns})
+    if "Student" not in df.columns and "Employment" in df.columns:
+        # since 2020 students are an Employment answer instead of a separate question
+        df["Student"] = df["Employment"].str.contains("Student", na=False).map({True: "Yes", False: "No"})
+    for col, answers in ANSWER_MAP.items():
+        if col in df.columns:
+            df[col] = df[col].replace(answers)
+    df = df.reindex(columns=COLUMNS)
+    df["Year"] = year
+    return df
+
+
+def ingest_year(entry, out_dir, session, chunk_size=CHUNK_SIZE, cache_dir=None):
+    """
+    Download, extract and normalize one survey edition into its partition
+
+    Parameters
+    ----------
+    entry : dict
+        manifest entry with `year`, `url` and optionally `member` and `sha256`
+    out_dir : str
+        the root of the partitioned output
+    session : requests.Session
+        session shared by all workers
+    chunk_size : int
+        number of bytes held in memory at any time while downloading
+    cache_dir : str, optional
+        directory of the archive cache
+
+    Returns
+    -------
+    str
+        the path of the written partition file
+    """
+    year = int(entry["year"])
+    sha256 = entry.get("sha256")
+    partition = os.path.join(out_dir, f"year={year}")
+    os.makedirs(partition, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp:
+        if cache_dir:
+            archive = cached_archive(entry["url"], cache_dir, sha256, chunk_size, session=session)
+        else:
+            archive = stream_to_file(entry["url"], os.path.join(tmp, "survey.zip"), chunk_size, session)
+            if sha256 and sha256sum(archive, chunk_size) != sha256.lower():
+                raise ValueError(f"Checksum mismatch for {entry['url']}")
+        raw = extract_member(archive, tmp, entry.get("member", MEMBER), chunk_size)
+
+        target = os.path.join(partition, MEMBER)
+        header = True
+        wanted = set(COLUMNS) | set(COLUMN_MAP)
+        for chunk in pd.read_csv(raw, usecols=lambda col: col in wanted, dtype=str, chunksize=ROWS_PER_CHUNK):
+            normalize_columns(chunk, year).to_csv(target, mode="w" if header else "a",
+                                                  header=header, index=False)
+            header = False
+    return target
+
+
+def main(manifest, out_dir, workers=4, cache_dir=None, chunk_size=CHUNK_SIZE):
+    with open(manifest) as f:
+        entries = json.load(f)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = int(workers)
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            entry["year"]: pool.submit(ingest_year, entry, out_dir, session, int(chunk_size), cache_dir)
+            for entry in entries
+        }
+        failed = []
+        for year, future in futures.items():
+            try:
+                print(f"Wrote {future.result()}")
+            except Exception as err:
+                print(f"Could not ingest the {year} survey.")
+                print(err)
+                failed.append(year)
+
+    if failed:
+        sys.exit(f"Failed to ingest {len(failed)} of {len(entries)} survey editions: {failed}")
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--manifest"], opt["--out_dir"], opt["--workers"], opt["--cache_dir"], opt["--chunk_size"])
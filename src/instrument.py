@@ -0,0 +1,293 @@
+"""Timing and memory instrumentation for the pipeline scripts.
+
+Each script wraps its work in `stage(...)` and its main steps in `phase(...)`. When the
+stage ends, its wall time, CPU time, memory and rows in/out, overall and per phase, are
+written as json to `<PIPELINE_METRICS_DIR>/<stage>.json` (default `results/metrics`).
+
+CPU time includes the child processes (e.g. the loky workers of the alpha search),
+whether they are still running or have exited. Memory is the resident set size at the
+start and end of each step plus the peak sampled during it, for this process and,
+separately, for the sum of its live child processes; the sampled values come from
+`/proc` and are missing on platforms without it, as is the peak RSS on platforms without
+the `resource` module. Live children are the ones the kernel lists in
+`/proc/<pid>/task/<tid>/children`, or the multiprocessing children of this process on
+kernels built without that file.
+
+Setting `PIPELINE_PROFILE=cprofile` also writes `<stage>.prof` (readable with pstats or
+snakeviz); `PIPELINE_PROFILE=pyinstrument` writes `<stage>.html`.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_DIR = "results/metrics"
+SAMPLE_INTERVAL = 0.05
+
+_current = []
+_PAGE_MIB = (resource.getpagesize() if resource is not None else 4096) / 1024 ** 2
+_TICK_S = 1 / os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 0.01
+
+
+def peak_rss_mib():
+    """
+    Peak resident set size of this process and its finished children, in MiB
+
+    Returns
+    -------
+    float
+        the larger of the two peaks (`ru_maxrss` is reported in KiB on Linux), None
+        without the `resource` module
+    """
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def rss_mib():
+    """
+    Current resident set size of this process in MiB, None without `/proc`
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MIB
+    except OSError:
+        return None
+
+
+def _children(pid):
+    # direct children of `pid`, listed per thread by the kernel (CONFIG_PROC_CHILDREN)
+    try:
+        tids = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return None
+    children = []
+    for tid in tids:
+        try:
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+        except FileNotFoundError:
+            return None
+        except OSError:
+            continue
+    return children
+
+
+def children_usage():
+    """
+    CPU seconds and resident set size (MiB) of the live descendants of this process
+
+    Returns
+    -------
+    tuple of float
+        the summed CPU time and RSS, zeros without `/proc`
+    """
+    cpu = rss = 0
+    pids = _children(os.getpid())
+    recursive = pids is not None
+    if not recursive:
+        # no children file, fall back to the pool workers this process started
+        pids = [p.pid for p in multiprocessing.active_children()]
+    while pids:
+        grandchildren = []
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    # fields after the parenthesised command name, starting at the state
+                    fields = f.read().rpartition(")")[2].split()
+            except OSError:
+                continue
+            cpu += int(fields[11]) + int(fields[12])
+            rss += int(fields[21])
+            if recursive:
+                grandchildren.extend(_children(pid) or [])
+        pids = grandchildren
+    return cpu * _TICK_S, rss * _PAGE_MIB
+
+
+def _cpu_s():
+    # reaped children are in os.times(), live ones are read from /proc; a child reaped
+    # during a step moves from the second term to the first, so deltas stay correct
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system + children_usage()[0]
+
+
+class _Sampler(threading.Thread):
+    # polls the RSS of this process and its children until stopped
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = rss_mib()
+        self.children_peak = children_usage()[1]
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(SAMPLE_INTERVAL):
+            self.sample()
+
+    def sample(self):
+        own = rss_mib()
+        if own is not None:
+            self.peak = max(self.peak or 0.0, own)
+        self.children_peak = max(self.children_peak, children_usage()[1])
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+
+
+class Measure:
+    """
+    Wall time, CPU time, memory and row counts of one stage or phase
+
+    Parameters
+    ----------
+    name : str
+        the stage or phase name
+    rows_in : int, optional
+        number of rows the step starts from
+    """
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.phases = []
+
+    def start(self):
+        self._wall = time.perf_counter()
+        self._cpu = _cpu_s()
+        self.rss_start_mib = rss_mib()
+        self._sampler = _Sampler()
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self.wall_s = time.perf_counter() - self._wall
+        self.cpu_s = _cpu_s() - self._cpu
+        self._sampler.stop()
+        self.rss_end_mib = rss_mib()
+        self.peak_rss_mib = self._sampler.peak
+        self.children_peak_rss_mib = self._sampler.children_peak
+        # ru_maxrss never decreases, so this is the process peak up to the end of the step
+        self.max_rss_mib = peak_rss_mib()
+        return self
+
+    def to_dict(self):
+        def mib(value):
+            return None if value is None else round(value, 1)
+
+        out = {
+            "name": self.name,
+            "wall_s": round(self.wall_s, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "rss_start_mib": mib(self.rss_start_mib),
+            "rss_end_mib": mib(self.rss_end_mib),
+            "peak_rss_mib": mib(self.peak_rss_mib),
+            "rss_delta_mib": (mib(self.peak_rss_mib - self.rss_start_mib)
+                              if self.peak_rss_mib is not None and self.rss_start_mib is not None else None),
+            "children_peak_rss_mib": mib(self.children_peak_rss_mib),
+            "max_rss_mib": mib(self.max_rss_mib),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+        }
+        if self.phases:
+            out["phases"] = [p.to_dict() for p in self.phases]
+        return out
+
+
+def _profiler(kind):
+    if kind == "cprofile":
+        import cProfile
+
+        return cProfile.Profile()
+    if kind == "pyinstrument":
+        from pyinstrument import Profiler
+
+        return Profiler()
+    return None
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Measure one pipeline stage and write its metrics when it ends
+
+    Parameters
+    ----------
+    name : str
+        the stage name, also the name of the json file
+    rows_in : int, optional
+        number of rows the stage starts from
+
+    Yields
+    ------
+    Measure
+        set `rows_out` on it once known
+    """
+    out_dir = os.environ.get("PIPELINE_METRICS_DIR", METRICS_DIR)
+    kind = os.environ.get("PIPELINE_PROFILE", "").lower()
+    profiler = _profiler(kind)
+    measure = Measure(name, rows_in).start()
+    _current.append(measure)
+    if profiler is not None:
+        profiler.enable() if kind == "cprofile" else profiler.start()
+    try:
+        yield measure
+    finally:
+        _current.pop()
+        measure.stop()
+        os.makedirs(out_dir, exist_ok=True)
+        if kind == "cprofile":
+            profiler.disable()
+            profiler.dump_stats(os.path.join(out_dir, f"{name}.prof"))
+        elif kind == "pyinstrument":
+            profiler.stop()
+            with open(os.path.join(out_dir, f"{name}.html"), "w") as f:
+                f.write(profiler.output_html())
+        metrics = measure.to_dict()
+        metrics["finished_at"] = datetime.now(timezone.utc).isoformat()
+        with open(os.path.join(out_dir, f"{name}.json"), "w") as f:
+            json.dump(metrics, f, indent=2)
+
+
+@contextmanager
+def phase(name, rows_in=None):
+    """
+    Measure one phase of the current stage; a no-op outside of `stage`
+
+    Parameters
+    ----------
+    name : str
+        the phase name
+    rows_in : int, optional
+        number of rows the phase starts from
+
+    Yields
+    ------
+    Measure
+        set `rows_out` on it once known
+    """
+    measure = Measure(name, rows_in)
+    if not _current:
+        # nothing would record the phase, so do not start a sampler for it
+        yield measure
+        return
+    measure.start()
+    try:
+        yield measure
+    finally:
+        measure.stop()
+        _current[-1].phases.append(measure)
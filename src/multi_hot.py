@@ -0,0 +1,67 @@
+"""Multi-hot encoding of the semicolon separated survey answers.
+
+`LanguageWorkedWith` and `DevType` hold several answers joined by `;`. One-hot encoding
+the joined strings gives one column per combination; `MultiHotEncoder` gives one column
+per answer instead, so unseen combinations of known answers are still encoded.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+class MultiHotEncoder(BaseEstimator, TransformerMixin):
+    """
+    Encode each delimited column as one indicator column per distinct answer
+
+    Parameters
+    ----------
+    sep : str
+        the separator between answers
+    sparse : bool
+        return a sparse CSR matrix instead of a dense array
+    """
+
+    def __init__(self, sep=";", sparse=True):
+        self.sep = sep
+        self.sparse = sparse
+
+    def _split(self, column):
+        return pd.Series(column).astype(object).fillna("").astype(str).str.split(self.sep)
+
+    def fit(self, X, y=None):
+        X = pd.DataFrame(X)
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.vocabularies_ = []
+        for col in X.columns:
+            answers = self._split(X[col]).explode()
+            self.vocabularies_.append(sorted(set(answers[answers != ""])))
+        return self
+
+    def transform(self, X):
+        X = pd.DataFrame(X)
+        blocks = []
+        for col, vocabulary in zip(X.columns, self.vocabularies_):
+            index = {answer: i for i, answer in enumerate(vocabulary)}
+            split = self._split(X[col])
+            columns = split.explode().map(index)
+            known = columns.notna().to_numpy()
+            rows = np.arange(len(X)).repeat(split.str.len())
+            data = np.ones(known.sum(), dtype=np.float64)
+            block = sp.csr_matrix(
+                (data, (rows[known], columns.to_numpy()[known].astype(np.int64))),
+                shape=(len(X), len(vocabulary)),
+            )
+            # duplicated answers within one response still count once
+            block.data[:] = 1.0
+            blocks.append(block)
+        out = sp.hstack(blocks, format="csr")
+        return out if self.sparse else out.toarray()
+
+    def get_feature_names_out(self, input_features=None):
+        names = input_features if input_features is not None else self.feature_names_in_
+        return np.asarray(
+            [f"{col}_{answer}" for col, vocabulary in zip(names, self.vocabularies_) for answer in vocabulary],
+            dtype=object,
+        )
@@ -0,0 +1,369 @@
+"""Fits the salary Ridge model out of core, streaming the training file in chunks.
+
+A first pass over the file collects the one-hot vocabulary (with --multi_hot, the
+distinct answers of DevType and LanguageWorkedWith, encoded one column per answer like
+`MultiHotEncoder`) and the imputation and scaling statistics of YearsCodePro. A second pass encodes each chunk and accumulates the
+sufficient statistics of Ridge (XᵀX, Xᵀy, column sums, Σy, Σy²) per cross-validation
+fold, so memory is bounded by the number of encoded features rather than the number of
+rows. The folds are the contiguous blocks `KFold(5)` uses, and for a given alpha the
+solution equals the in-memory `build_model` pipeline fitted on the whole file. During
+cross-validation the vocabulary and scaling come from the whole file rather than being
+refitted per fold, so fold scores can differ slightly from `RandomizedSearchCV`.
+
+The training and test files are read in chunks from csv or, in row batches, from parquet.
+The model is written as a compact artifact (see compact_model.py).
+
+Usage: src/out_of_core.py --train=<train> --out_dir=<out_dir> [--test=<test>] [--chunksize=<chunksize>] [--alpha=<alpha>] [--multi_hot]
+
+Options:
+--train=<train>           Path (including filename) to training data (csv or parquet file)
+--out_dir=<out_dir>       Directory the compact model and the tuning results are written to
+--test=<test>             Path (including filename) to test data scored with the fitted model (csv or parquet file)
+--chunksize=<chunksize>   Number of rows encoded at a time [default: 50000]
+--alpha=<alpha>           Ridge regularization strength; if omitted it is picked by 5-fold cross-validation
+--multi_hot               Encode DevType and LanguageWorkedWith with one column per answer instead of per combination
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from docopt import docopt
+from scipy import sparse as sp
+
+from compact_model import MISSING, CompactPredictor
+from data_io import data_format
+from instrument import phase, stage
+
+NUMERIC = "YearsCodePro"
+CATEGORICAL = ["DevType", "EdLevel", "LanguageWorkedWith"]
+# encoded per answer with --multi_hot, after EdLevel as in make_preprocessor
+MULTI_HOT = ["DevType", "LanguageWorkedWith"]
+SEP = ";"
+TARGET = "ConvertedComp"
+ALPHAS = np.logspace(-3, 5)
+FOLDS = 5
+
+
+def read_chunks(path, chunksize=50000, columns=None):
+    """
+    Iterate over a csv or parquet file `chunksize` rows at a time
+
+    Parameters
+    ----------
+    path : str
+        path to the data file
+    chunksize : int
+        number of rows read at a time
+    columns : list of str, optional
+        only read these columns
+
+    Yields
+    ------
+    dataframe
+        the rows of the chunk
+    """
+    fmt = data_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            chunk = batch.to_pandas()
+            # dictionary encoded columns come back as categoricals, which reject the MISSING fill
+            yield chunk.astype({col: object for col in chunk.select_dtypes("category").columns})
+    else:
+        raise ValueError(f"Out-of-core training reads csv or parquet files, not {fmt}: {path}")
+
+
+def encodings(multi_hot=False):
+    """
+    The categorical columns in design-matrix order with their encoding
+
+    Parameters
+    ----------
+    multi_hot : bool
+        encode `MULTI_HOT` per answer, as `make_preprocessor(multi_hot=True)` does
+
+    Returns
+    -------
+    list of tuple
+        (column, "onehot" or "multihot") pairs
+    """
+    if not multi_hot:
+        return [(col, "onehot") for col in CATEGORICAL]
+    return ([(col, "onehot") for col in CATEGORICAL if col not in MULTI_HOT]
+            + [(col, "multihot") for col in MULTI_HOT])
+
+
+def _answers(column):
+    # the `;` separated answers of every row, a missing answer splits into [""]
+    return column.astype(object).fillna("").astype(str).str.split(SEP)
+
+
+def first_pass(path, chunksize=50000, multi_hot=False):
+    """
+    Collect the vocabulary and the YearsCodePro statistics in one pass
+
+    Parameters
+    ----------
+    path : str
+        path to the training csv or parquet file
+    chunksize : int
+        number of rows read at a time
+    multi_hot : bool
+        collect the answers rather than the combinations of `MULTI_HOT`
+
+    Returns
+    -------
+    dict
+        row count, encodings, sorted categories per column and the imputer/scaler parameters
+    """
+    n = count = total = squares = 0
+    columns = encodings(multi_hot)
+    categories = {col: set() for col, _ in columns}
+    for chunk in read_chunks(path, chunksize, [NUMERIC, TARGET] + CATEGORICAL):
+        n += len(chunk)
+        years = chunk[NUMERIC].dropna().to_numpy(dtype=np.float64)
+        count += len(years)
+        total += years.sum()
+        squares += (years ** 2).sum()
+        for col, encoding in columns:
+            if encoding == "multihot":
+                answers = _answers(chunk[col]).explode()
+                categories[col].update(answers[answers != ""].unique())
+            else:
+                categories[col].update(chunk[col].astype(object).fillna(MISSING).astype(str).unique())
+
+    mean = total / count
+    # imputed rows sit at the mean, so they add nothing to the sum of squares but count in n
+    std = np.sqrt(max(squares - count * mean ** 2, 0.0) / n)
+    return {
+        "n": n,
+        "fill": mean,
+        "mean": mean,
+        "scale": std if std > 0 else 1.0,
+        "encodings": columns,
+        "categories": {col: sorted(values) for col, values in categories.items()},
+    }
+
+
+def encode(chunk, vocab):
+    """
+    Encode a chunk exactly like the in-memory column transformer
+
+    Parameters
+    ----------
+    chunk : dataframe
+        rows of the training or test file
+    vocab : dict
+        the output of `first_pass`
+
+    Returns
+    -------
+    sparse matrix
+        the CSR design matrix of the chunk
+    """
+    years = chunk[NUMERIC].to_numpy(dtype=np.float64)
+    years = np.where(np.isnan(years), vocab["fill"], years)
+    blocks = [sp.csr_matrix(((years - vocab["mean"]) / vocab["scale"])[:, None])]
+    for col, encoding in vocab["encodings"]:
+        index = {value: i for i, value in enumerate(vocab["categories"][col])}
+        if encoding == "multihot":
+            answers = _answers(chunk[col])
+            codes = answers.explode().map(index)
+            rows = np.arange(len(chunk)).repeat(answers.str.len())
+        else:
+            codes = chunk[col].astype(object).fillna(MISSING).astype(str).map(index)
+            rows = np.arange(len(chunk))
+        known = codes.notna().to_numpy()
+        block = sp.csr_matrix(
+            (np.ones(known.sum()), (rows[known], codes.to_numpy()[known].astype(np.int64))),
+            shape=(len(chunk), len(index)),
+        )
+        # an answer repeated within one response still counts once
+        block.data[:] = 1.0
+        blocks.append(block)
+    return sp.hstack(blocks, format="csr")
+
+
+def fold_bounds(n, folds=FOLDS):
+    # the contiguous blocks of sklearn's KFold without shuffling
+    sizes = np.full(folds, n // folds)
+    sizes[: n % folds] += 1
+    return np.concatenate([[0], np.cumsum(sizes)])
+
+
+def second_pass(path, vocab, chunksize=50000, folds=FOLDS):
+    """
+    Accumulate the Ridge sufficient statistics of every fold
+
+    Parameters
+    ----------
+    path : str
+        path to the training csv or parquet file
+    vocab : dict
+        the output of `first_pass`
+    chunksize : int
+        number of rows encoded at a time
+    folds : int
+        number of cross-validation folds
+
+    Returns
+    -------
+    list of dict
+        per fold: n, XᵀX, Xᵀy, column sums, Σy and Σy²
+    """
+    width = 1 + sum(len(v) for v in vocab["categories"].values())
+    stats = [{"n": 0, "gram": np.zeros((width, width)), "moment": np.zeros(width),
+              "x_sum": np.zeros(width), "y_sum": 0.0, "y_sq": 0.0} for _ in range(folds)]
+    bounds = fold_bounds(vocab["n"], folds)
+
+    start = 0
+    for chunk in read_chunks(path, chunksize, [NUMERIC, TARGET] + CATEGORICAL):
+        X = encode(chunk, vocab)
+        y = chunk[TARGET].to_numpy(dtype=np.float64)
+        rows = np.arange(start, start + len(chunk))
+        fold_of_row = np.searchsorted(bounds, rows, side="right") - 1
+        for k in np.unique(fold_of_row):
+            mask = fold_of_row == k
+            Xk, yk = X[mask], y[mask]
+            s = stats[k]
+            s["n"] += len(yk)
+            s["gram"] += (Xk.T @ Xk).toarray()
+            s["moment"] += Xk.T @ yk
+            s["x_sum"] += np.asarray(Xk.sum(axis=0)).ravel()
+            s["y_sum"] += yk.sum()
+            s["y_sq"] += (yk ** 2).sum()
+        start += len(chunk)
+    return stats
+
+
+def combine(stats):
+    return {key: sum(s[key] for s in stats) for key in stats[0]}
+
+
+def solve(total, alphas):
+    """
+    Ridge coefficients and intercepts with an unpenalized intercept, from sufficient statistics
+
+    Parameters
+    ----------
+    total : dict
+        summed statistics of the training rows
+    alphas : array
+        regularization strengths
+
+    Returns
+    -------
+    coefs : array of shape (n_features, n_alphas)
+    intercepts : array of shape (n_alphas,)
+    """
+    n = total["n"]
+    x_mean = total["x_sum"] / n
+    y_mean = total["y_sum"] / n
+    gram = total["gram"] - n * np.outer(x_mean, x_mean)
+    moment = total["moment"] - n * x_mean * y_mean
+    eigvals, eigvecs = np.linalg.eigh(gram)
+    eigvals = np.clip(eigvals, 0, None)
+    coefs = eigvecs @ ((eigvecs.T @ moment)[:, None] / (eigvals[:, None] + np.asarray(alphas)[None, :]))
+    return coefs, y_mean - x_mean @ coefs
+
+
+def r2_from_stats(s, coefs, intercepts):
+    # residual sum of squares expanded in terms of the accumulated moments
+    sse = (s["y_sq"] - 2 * coefs.T @ s["moment"] - 2 * intercepts * s["y_sum"]
+           + np.einsum("ia,ij,ja->a", coefs, s["gram"], coefs)
+           + 2 * intercepts * (s["x_sum"] @ coefs) + s["n"] * intercepts ** 2)
+    sst = s["y_sq"] - s["y_sum"] ** 2 / s["n"]
+    return 1 - sse / sst
+
+
+def cross_validate(stats, alphas=ALPHAS):
+    """
+    Mean train and validation R² of every alpha over the folds
+
+    Parameters
+    ----------
+    stats : list of dict
+        per-fold statistics from `second_pass`
+    alphas : array
+        regularization strengths
+
+    Returns
+    -------
+    dataframe
+        one row per alpha in the layout of the alpha-tuning table
+    """
+    test_scores, train_scores = [], []
+    for k in range(len(stats)):
+        train = combine([s for i, s in enumerate(stats) if i != k])
+        coefs, intercepts = solve(train, alphas)
+        test_scores.append(r2_from_stats(stats[k], coefs, intercepts))
+        train_scores.append(r2_from_stats(train, coefs, intercepts))
+    return pd.DataFrame({
+        "param_ridge__alpha": alphas,
+        "mean_test_score": np.mean(test_scores, axis=0),
+        "mean_train_score": np.mean(train_scores, axis=0),
+    })
+
+
+def to_compact(vocab, coef, intercept):
+    meta = {"intercept": float(intercept), "categorical": [],
+            "numeric": [{"column": NUMERIC, "index": 0, "fill": vocab["fill"],
+                         "mean": vocab["mean"], "scale": vocab["scale"]}]}
+    offset = 1
+    for col, encoding in vocab["encodings"]:
+        values = vocab["categories"][col]
+        entry = {"column": col, "encoding": encoding, "index": {v: offset + i for i, v in enumerate(values)}}
+        if encoding == "multihot":
+            entry["sep"] = SEP
+        meta["categorical"].append(entry)
+        offset += len(values)
+    return CompactPredictor(meta, np.asarray(coef, dtype=np.float64))
+
+
+def main(train, out_dir, test=None, chunksize=50000, alpha=None, multi_hot=False):
+    chunksize = int(chunksize)
+    with stage("out_of_core") as st:
+        with phase("vocabulary") as p:
+            vocab = first_pass(train, chunksize, multi_hot)
+            p.rows_out = vocab["n"]
+        st.rows_in = vocab["n"]
+        with phase("accumulate", rows_in=vocab["n"]):
+            stats = second_pass(train, vocab, chunksize)
+
+        os.makedirs(out_dir, exist_ok=True)
+        if alpha is None:
+            with phase("cross_validate"):
+                cv_df = cross_validate(stats)
+            cv_df.to_csv(os.path.join(out_dir, "out_of_core_tuning.csv"), index=False)
+            alpha = float(cv_df.loc[cv_df["mean_test_score"].idxmax(), "param_ridge__alpha"])
+        alpha = float(alpha)
+
+        with phase("solve"):
+            coefs, intercepts = solve(combine(stats), [alpha])
+        model = to_compact(vocab, coefs[:, 0], intercepts[0])
+        model.save(os.path.join(out_dir, "compact_model"))
+        summary = {"alpha": alpha, "rows": vocab["n"], "features": len(coefs)}
+
+        if test:
+            with phase("test_scoring") as p:
+                y_true, y_pred = [], []
+                for chunk in read_chunks(test, chunksize):
+                    y_true.append(chunk[TARGET].to_numpy(dtype=np.float64))
+                    y_pred.append(model.predict(chunk))
+                y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+                summary["r_sq_test"] = 1 - ((y_true - y_pred) ** 2).sum() / ((y_true - y_true.mean()) ** 2).sum()
+                p.rows_out = len(y_true)
+
+        with open(os.path.join(out_dir, "out_of_core_summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Fitted alpha={alpha:g} on {vocab['n']} rows, saved model to {out_dir}/compact_model")
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--train"], opt["--out_dir"], opt["--test"], opt["--chunksize"], opt["--alpha"], opt["--multi_hot"])
@@ -0,0 +1,132 @@
+"""Scores a file of candidate profiles with the serialized salary model.
+
+The input is read and scored in fixed-size chunks and the predictions are appended to
+the output as each chunk finishes, so memory does not grow with the input size.
+
+Usage: src/predict.py --model=<model> --input=<input> --output=<output> [--chunksize=<chunksize>] [--workers=<workers>]
+
+Options:
+--model=<model>           Path to the serialized model (e.g. results/best_model_pipe.joblib)
+--input=<input>           Path to the profiles to score (csv, parquet or feather file)
+--output=<output>         Path of the csv file the predictions are written to
+--chunksize=<chunksize>   Number of rows scored at a time [default: 50000]
+--workers=<workers>       Number of processes scoring chunks in parallel, 1 scores in this process [default: 1]
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from docopt import docopt
+
+from data_io import data_format
+
+FEATURES = ["YearsCodePro", "DevType", "EdLevel", "LanguageWorkedWith"]
+PREDICTION = "predicted_ConvertedComp"
+
+_model = None
+
+
+def iter_chunks(path, chunksize=50000):
+    """
+    Yield the rows of a csv, parquet or feather file as dataframes of at most `chunksize` rows
+
+    Parameters
+    ----------
+    path : str
+        path to the input file
+    chunksize : int
+        maximum number of rows per chunk
+
+    Yields
+    ------
+    dataframe
+        the next chunk of rows
+    """
+    fmt = data_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    elif fmt == "feather":
+        import pyarrow as pa
+        import pyarrow.ipc
+
+        # feather v2 is the Arrow IPC file format, so the record batches are read one at a time
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for offset in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(offset, chunksize).to_pandas()
+    else:
+        import pandas as pd
+
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def _load_model(model_path):
+    global _model
+    from joblib import load
+
+    _model = load(model_path)
+
+
+def _score(chunk):
+    chunk[PREDICTION] = _model.predict(chunk[FEATURES])
+    return chunk
+
+
+def score_chunks(model_path, chunks, workers=1):
+    """
+    Score `chunks` with the model at `model_path`, loading it once per process
+
+    At most two chunks per worker are in flight, so memory stays bounded when the
+    input is read faster than it is scored.
+
+    Parameters
+    ----------
+    model_path : str
+        path to the serialized model
+    chunks : iterable of dataframes
+        the profiles to score
+    workers : int
+        number of scoring processes, 1 scores in the calling process
+
+    Yields
+    ------
+    dataframe
+        each chunk, in input order, with a `predicted_ConvertedComp` column
+    """
+    if workers <= 1:
+        _load_model(model_path)
+        for chunk in chunks:
+            yield _score(chunk)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_load_model, initargs=(model_path,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_score, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(model, input, output, chunksize=50000, workers=1):
+    start = time.perf_counter()
+    rows = 0
+    header = True
+    for scored in score_chunks(model, iter_chunks(input, int(chunksize)), int(workers)):
+        scored.to_csv(output, mode="w" if header else "a", header=header, index=False)
+        header = False
+        rows += len(scored)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows in {elapsed:.2f} s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--model"], opt["--input"], opt["--output"], opt["--chunksize"], opt["--workers"])
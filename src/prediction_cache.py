@@ -0,0 +1,114 @@
+"""Memoizes salary predictions for repeated candidate profiles.
+
+The model input is small and repetitive: a handful of education levels, integer years
+of experience and a finite set of role and language answers. `CachedPredictor` keeps the
+predictions of recently seen profiles in a bounded LRU map with an optional time to
+live and only sends unseen profiles to the wrapped model. The model sees the normalized
+values the cache is keyed on, so profiles that share a key share a prediction.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+FEATURES = ["YearsCodePro", "DevType", "EdLevel", "LanguageWorkedWith"]
+
+
+def _normalize(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, str):
+        return value.strip()
+    return float(value)
+
+
+def profile_key(profile):
+    """
+    Normalized, hashable key of one profile
+
+    Parameters
+    ----------
+    profile : mapping
+        a profile with the `FEATURES` keys
+
+    Returns
+    -------
+    tuple
+        the normalized feature values in `FEATURES` order
+    """
+    return tuple(_normalize(profile.get(col)) for col in FEATURES)
+
+
+class CachedPredictor:
+    """
+    LRU/TTL prediction cache in front of a model's `predict`
+
+    Parameters
+    ----------
+    model : estimator
+        any object with a `predict` method
+    max_entries : int
+        maximum number of cached profiles, the least recently used is dropped first
+    ttl : float, optional
+        seconds after which a cached prediction is recomputed
+    """
+
+    def __init__(self, model, max_entries=100000, ttl=None):
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _records(self, X):
+        if isinstance(X, (list, tuple)):
+            return X
+        return X[FEATURES].to_dict("records")
+
+    def predict(self, X):
+        records = self._records(X)
+        keys = [profile_key(r) for r in records]
+        results = [None] * len(keys)
+        missing = {}
+        now = time.monotonic()
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and (self.ttl is None or now - entry[1] < self.ttl):
+                    self._entries.move_to_end(key)
+                    results[i] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            import pandas as pd
+
+            # None becomes NaN so the model's imputers recognize missing answers
+            subset = pd.DataFrame([[math.nan if v is None else v for v in key] for key in missing],
+                                  columns=FEATURES)
+            predictions = self.model.predict(subset)
+            with self._lock:
+                for (key, rows), prediction in zip(missing.items(), predictions):
+                    prediction = float(prediction)
+                    for i in rows:
+                        results[i] = prediction
+                    self._entries[key] = (prediction, now)
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return results
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
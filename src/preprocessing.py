@@ -0,0 +1,222 @@
+"""Cleans, splits and pre-processes the Tech Salary Predictor data. Writes the training and test data to separate files.
+
+Only the columns used by the analysis are parsed, and the row filters are applied to
+each chunk as it is read, so memory scales with the filtered subset rather than the
+width of the raw survey.
+
+Every respondent keeps the raw row number as an id while DevType is split into one row
+per role, and the train/test split draws whole respondents, so no respondent ends up in
+both sets. The id is written as a `Respondent` column, so the model's cross-validation
+can keep the rows of a respondent in the same fold too. With --multi_dev_type there is one row per respondent with the `;` joined
+roles, which `salary_prediction_model.py --multi_hot` encodes as a sparse multi-hot
+matrix; the training data is then several times smaller.
+
+Usage: src/preprocessing.py --input=<input> --out_dir=<out_dir> [--chunksize=<chunksize>] [--format=<format>] [--multi_dev_type] [--countries=<countries>]
+
+Options:
+--input=<input>           Path (including filename) to raw data (csv file), or a directory of year=<year>/ partitions written by ingest_surveys.py
+--out_dir=<out_dir>       Path to directory where the processed data should be written
+--chunksize=<chunksize>   Number of raw rows parsed at a time [default: 20000]
+--format=<format>         Output format of the processed data: csv, parquet or feather [default: csv]
+--multi_dev_type          Keep one row per respondent with the `;` joined DevType instead of one row per role
+--countries=<countries>   Comma separated countries to keep; with more than one, a Country column is kept and the salary cut-off is applied per country [default: Canada]
+"""
+
+# pandas and numpy are imported in the functions that use them, so `--help` and the
+# schedulers that only check the command line start quickly
+import glob
+import os
+
+from docopt import docopt
+
+from data_io import FORMATS, write_data
+from instrument import phase, stage
+
+COLUMNS = ["Country", "EdLevel", "YearsCodePro", "LanguageWorkedWith", "DevType",
+           "ConvertedComp", "Employment", "Student"]
+OUTPUT_COLUMNS = ["EdLevel", "YearsCodePro", "LanguageWorkedWith", "DevType",
+                  "ConvertedComp", "Employment"]
+COUNTRY = "Canada"
+QUANTILE = 0.92
+TRAIN_FRACTION = 0.8
+SEED = 123
+RESPONDENT = "Respondent"
+
+
+def filter_chunk(df, country=COUNTRY, explode=True):
+    """
+    Keep full-time, non-student respondents of `country` with a numeric YearsCodePro
+
+    Parameters
+    ----------
+    df : dataframe
+        a chunk of the raw survey restricted to `COLUMNS`
+    country : str or list of str
+        the country or countries to keep, several countries keep the Country column
+    explode : bool
+        split DevType on `;` into one row per developer role
+
+    Returns
+    -------
+    dataframe
+        the filtered rows, with the raw row number in a `Respondent` column
+    """
+    import pandas as pd
+
+    countries = [country] if isinstance(country, str) else list(country)
+    keep = (
+        df["Country"].isin(countries)
+        & (df["Employment"] == "Employed full-time")
+        & (df["Student"] == "No")
+        & df["YearsCodePro"].notna()
+        & ~df["YearsCodePro"].isin(["Less than 1 year", "More than 50 years"])
+    )
+    df = df.loc[keep, OUTPUT_COLUMNS + (["Country"] if len(countries) > 1 else [])].copy()
+    df["YearsCodePro"] = pd.to_numeric(df["YearsCodePro"], errors="coerce")
+    # read_filtered numbers rows across chunks and files, so the index identifies the respondent
+    df[RESPONDENT] = df.index
+    if not explode:
+        return df
+    df["DevType"] = df["DevType"].str.split(";")
+    return df.explode("DevType")
+
+
+def input_files(path):
+    """
+    The raw survey files at `path`: the file itself, or the partitions of a directory
+    written by ingest_surveys.py in year order
+
+    Parameters
+    ----------
+    path : str
+        path to a raw survey csv or a partitioned directory
+
+    Returns
+    -------
+    list of str
+        the csv files to read
+    """
+    if not os.path.isdir(path):
+        return [path]
+    files = sorted(glob.glob(os.path.join(path, "year=*", "*.csv")))
+    if not files:
+        raise FileNotFoundError(f"No year=<year>/ partitions in {path}")
+    return files
+
+
+def read_filtered(path, chunksize=20000, country=COUNTRY, explode=True):
+    """
+    Read the raw survey in chunks, parsing only `COLUMNS` and filtering each chunk
+
+    Parameters
+    ----------
+    path : str
+        path to the raw survey csv or to a directory of yearly partitions
+    chunksize : int
+        number of raw rows parsed at a time
+    country : str or list of str
+        the country or countries to keep
+    explode : bool
+        split DevType on `;` into one row per developer role
+
+    Returns
+    -------
+    dataframe
+        the filtered survey rows
+    """
+    import pandas as pd
+
+    frames = []
+    offset = 0
+    for file in input_files(path):
+        for chunk in pd.read_csv(file, usecols=COLUMNS, dtype=str, chunksize=chunksize):
+            # number the rows across files so respondent ids stay unique
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            frames.append(filter_chunk(chunk, country, explode))
+    df = pd.concat(frames, ignore_index=True)
+    df["ConvertedComp"] = pd.to_numeric(df["ConvertedComp"], errors="coerce")
+    return df
+
+
+def pre_processing(df, quantile=QUANTILE):
+    """
+    Drop the top salaries above the `quantile` of ConvertedComp, per country if the
+    rows have a Country column
+
+    Parameters
+    ----------
+    df : dataframe
+        the filtered survey rows
+    quantile : float
+        the salary quantile used as the upper cut-off
+
+    Returns
+    -------
+    dataframe
+        the rows whose ConvertedComp is below the cut-off
+    """
+    if "Country" in df.columns:
+        cutoff = df.groupby("Country")["ConvertedComp"].transform(lambda s: s.quantile(quantile))
+    else:
+        cutoff = df["ConvertedComp"].quantile(quantile)
+    return df[df["ConvertedComp"] < cutoff].reset_index(drop=True)
+
+
+def splitting(df, fraction=TRAIN_FRACTION, seed=SEED, groups=None):
+    """
+    Randomly split the rows into a training and a test set, keeping the rows of a
+    group together
+
+    Parameters
+    ----------
+    df : dataframe
+        the pre-processed rows
+    fraction : float
+        share of the rows that goes into the training set
+    seed : int
+        seed of the random permutation
+    groups : array-like, optional
+        group of every row; `fraction` then applies to the groups rather than the rows
+
+    Returns
+    -------
+    tuple of dataframes
+        the training and the test set
+    """
+    import numpy as np
+
+    if groups is None:
+        groups = np.arange(len(df))
+    uniques, codes = np.unique(np.asarray(groups), return_inverse=True)
+    picked = np.random.RandomState(seed).permutation(len(uniques))[: int(np.floor(fraction * len(uniques)))]
+    in_train = np.zeros(len(uniques), dtype=bool)
+    in_train[picked] = True
+    mask = in_train[codes]
+    return df[mask], df[~mask]
+
+
+def main(input, out_dir, chunksize=20000, format="csv", multi_dev_type=False, countries=COUNTRY):
+    with stage("preprocess") as st:
+        with phase("read_filter") as p:
+            df = read_filtered(input, int(chunksize), [c.strip() for c in countries.split(",")],
+                               explode=not multi_dev_type)
+            p.rows_out = len(df)
+        with phase("salary_cutoff", rows_in=len(df)) as p:
+            df = pre_processing(df)
+            p.rows_out = len(df)
+        with phase("split", rows_in=len(df)) as p:
+            training_data, test_data = splitting(df, groups=df[RESPONDENT])
+            p.rows_out = len(training_data) + len(test_data)
+
+        with phase("write", rows_in=len(df)):
+            os.makedirs(out_dir, exist_ok=True)
+            write_data(training_data, os.path.join(out_dir, "training" + FORMATS[format]))
+            write_data(test_data, os.path.join(out_dir, "test" + FORMATS[format]))
+        st.rows_out = len(df)
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--input"], opt["--out_dir"], opt["--chunksize"], opt["--format"], opt["--multi_dev_type"],
+         opt["--countries"])
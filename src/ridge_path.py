@@ -0,0 +1,113 @@
+"""Cross-validated Ridge regularization path computed in closed form.
+
+Tuning `ridge__alpha` with `RandomizedSearchCV` refits the preprocessing and the Ridge
+model once per fold and candidate. Only alpha changes between candidates, so
+`RidgePathSearch` preprocesses each fold once, eigendecomposes the centered Gram matrix
+of the fold and reads the solution for every alpha off that decomposition.
+"""
+
+import numpy as np
+from scipy import sparse as sp
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.metrics import r2_score
+from sklearn.model_selection import check_cv
+
+
+def ridge_path(X, y, alphas):
+    """
+    Ridge coefficients and intercepts for every alpha from one eigendecomposition
+
+    Parameters
+    ----------
+    X : array or sparse matrix of shape (n_samples, n_features)
+        the encoded training data
+    y : array of shape (n_samples,)
+        the target
+    alphas : array of shape (n_alphas,)
+        the regularization strengths
+
+    Returns
+    -------
+    coefs : array of shape (n_features, n_alphas)
+    intercepts : array of shape (n_alphas,)
+    """
+    n = X.shape[0]
+    y = np.asarray(y, dtype=np.float64)
+    x_mean = np.asarray(X.mean(axis=0)).ravel()
+    y_mean = y.mean()
+
+    # centered Gram matrix and moment, without densifying a sparse X
+    gram = np.asarray((X.T @ X).todense() if sp.issparse(X) else X.T @ X) - n * np.outer(x_mean, x_mean)
+    moment = np.asarray(X.T @ y).ravel() - n * x_mean * y_mean
+
+    eigvals, eigvecs = np.linalg.eigh(gram)
+    eigvals = np.clip(eigvals, 0, None)
+    projected = eigvecs.T @ moment
+    coefs = eigvecs @ (projected[:, None] / (eigvals[:, None] + np.asarray(alphas)[None, :]))
+    intercepts = y_mean - x_mean @ coefs
+    return coefs, intercepts
+
+
+class RidgePathSearch(BaseEstimator, RegressorMixin):
+    """
+    Cross-validated search over `ridge__alpha` of a preprocessing + Ridge pipeline
+
+    Exposes the same `cv_results_`, `best_params_`, `best_estimator_`, `predict` and
+    `score` as the `RandomizedSearchCV` it replaces.
+
+    Parameters
+    ----------
+    estimator : Pipeline
+        a pipeline whose last step is named `ridge`
+    alphas : array-like
+        the candidate regularization strengths
+    cv : int or cross-validation generator
+        the cross-validation splitting strategy
+    """
+
+    def __init__(self, estimator, alphas, cv=5):
+        self.estimator = estimator
+        self.alphas = alphas
+        self.cv = cv
+
+    def fit(self, X, y, groups=None):
+        alphas = np.asarray(self.alphas, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        cv = check_cv(self.cv)
+        test_scores, train_scores = [], []
+
+        for train_idx, test_idx in cv.split(X, y, groups):
+            preprocessor = clone(self.estimator[:-1]).fit(X.iloc[train_idx], y[train_idx])
+            X_fold = preprocessor.transform(X.iloc[train_idx])
+            X_val = preprocessor.transform(X.iloc[test_idx])
+            coefs, intercepts = ridge_path(X_fold, y[train_idx], alphas)
+
+            pred_train = np.asarray(X_fold @ coefs) + intercepts
+            pred_val = np.asarray(X_val @ coefs) + intercepts
+            train_scores.append([r2_score(y[train_idx], pred_train[:, i]) for i in range(len(alphas))])
+            test_scores.append([r2_score(y[test_idx], pred_val[:, i]) for i in range(len(alphas))])
+
+        test_scores = np.asarray(test_scores)
+        train_scores = np.asarray(train_scores)
+        mean_test = test_scores.mean(axis=0)
+        self.cv_results_ = {
+            "param_ridge__alpha": np.ma.MaskedArray(alphas, mask=False, dtype=object),
+            "params": [{"ridge__alpha": alpha} for alpha in alphas],
+            "mean_test_score": mean_test,
+            "std_test_score": test_scores.std(axis=0),
+            "mean_train_score": train_scores.mean(axis=0),
+            "std_train_score": train_scores.std(axis=0),
+            "rank_test_score": (np.argsort(np.argsort(-mean_test)) + 1).astype(np.int32),
+        }
+        for i in range(test_scores.shape[0]):
+            self.cv_results_[f"split{i}_test_score"] = test_scores[i]
+            self.cv_results_[f"split{i}_train_score"] = train_scores[i]
+
+        self.best_index_ = int(np.argmax(mean_test))
+        self.best_score_ = mean_test[self.best_index_]
+        self.best_params_ = self.cv_results_["params"][self.best_index_]
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
+
+    def predict(self, X):
+        return self.best_estimator_.predict(X)
@@ -0,0 +1,209 @@
+"""Runs the analysis pipeline (download, preprocess, eda, model, report) as a DAG.
+
+A stage is skipped when its outputs exist and the SHA-256 of its input files and its
+command line match the previous successful run, so touching a file without changing it
+reruns nothing. Stages whose inputs are ready run at the same time (e.g. eda and model).
+Hashes of successful runs are kept in .pipeline/state.json.
+
+Usage: src/run_pipeline.py [--stages=<stages>] [--workers=<workers>] [--force] [--dry_run]
+
+Options:
+--stages=<stages>     Comma separated stages to consider, from download, preprocess, eda, model, report [default: all]
+--workers=<workers>   Number of stages run at the same time [default: 2]
+--force               Rerun the selected stages even if their inputs did not change
+--dry_run             Only print which stages would run, including the stages downstream of them
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from docopt import docopt
+
+STATE = ".pipeline/state.json"
+URL = "https://info.stackoverflowsolutions.com/rs/719-EMH-566/images/stack-overflow-developer-survey-2019.zip"
+RAW = "data/raw/survey_results_public.csv"
+TRAIN = "data/processed/training.csv"
+TEST = "data/processed/test.csv"
+EDA_PLOTS = [f"results/{name}.png" for name in
+             ["edu_plot", "role_plot", "language_plot", "code_years_plot",
+              "salary_density_plot", "language_codeyears_plot"]]
+MODEL_OUTPUTS = ["results/best_model_pipe.joblib", "results/test_result.joblib", "results/alpha-tuning.png"]
+
+STAGES = [
+    {
+        "name": "download",
+        "cmd": [sys.executable, "src/download_data.py", f"--url={URL}", "--out_dir=data/raw", "--stream"],
+        "inputs": ["src/download_data.py", "src/instrument.py"],
+        "outputs": [RAW],
+    },
+    {
+        "name": "preprocess",
+        "cmd": [sys.executable, "src/preprocessing.py", f"--input={RAW}", "--out_dir=data/processed"],
+        "inputs": ["src/preprocessing.py", "src/data_io.py", "src/instrument.py", RAW],
+        "outputs": [TRAIN, TEST],
+    },
+    {
+        "name": "eda",
+        "cmd": [sys.executable, "src/eda.py", f"--train={TRAIN}", "--out_dir=results/", "--renderer=node"],
+        "inputs": ["src/eda.py", "src/data_io.py", "src/instrument.py", TRAIN],
+        "outputs": EDA_PLOTS,
+    },
+    {
+        "name": "model",
+        "cmd": [sys.executable, "src/salary_prediction_model.py", f"--train={TRAIN}", "--out_dir=results",
+                f"--test={TEST}"],
+        "inputs": ["src/salary_prediction_model.py", "src/data_io.py", "src/multi_hot.py",
+                   "src/ridge_path.py", "src/instrument.py", TRAIN, TEST],
+        "outputs": MODEL_OUTPUTS,
+    },
+    {
+        "name": "report",
+        "cmd": ["jupyter-book", "build", "docs"],
+        "inputs": ["docs/_config.yml", "docs/_toc.yml", "docs/index.ipynb", "docs/report.ipynb",
+                   "docs/references.bib"] + MODEL_OUTPUTS + EDA_PLOTS,
+        "outputs": ["docs/_build/html/report.html"],
+    },
+]
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stage_hash(stage):
+    """
+    Hash the command line and the contents of every input of `stage`
+
+    Parameters
+    ----------
+    stage : dict
+        an entry of `STAGES`
+
+    Returns
+    -------
+    str
+        the hex digest, or None if an input is missing
+    """
+    digest = hashlib.sha256(json.dumps(stage["cmd"][1:]).encode())
+    for path in stage["inputs"]:
+        if not os.path.exists(path):
+            return None
+        digest.update(path.encode())
+        digest.update(file_hash(path).encode())
+    return digest.hexdigest()
+
+
+def dependencies(stages):
+    """
+    Map each stage name to the names of the stages producing its inputs
+
+    Parameters
+    ----------
+    stages : list of dict
+        the pipeline stages
+
+    Returns
+    -------
+    dict
+        stage name to set of upstream stage names
+    """
+    producers = {out: s["name"] for s in stages for out in s["outputs"]}
+    return {s["name"]: {producers[i] for i in s["inputs"] if i in producers} for s in stages}
+
+
+def load_state():
+    try:
+        with open(STATE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE), exist_ok=True)
+    tmp = STATE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE)
+
+
+def is_current(stage, state):
+    digest = stage_hash(stage)
+    return (digest is not None and state.get(stage["name"]) == digest
+            and all(os.path.exists(out) for out in stage["outputs"]))
+
+
+def run_stage(stage):
+    print(f"[{stage['name']}] {' '.join(stage['cmd'])}", flush=True)
+    subprocess.run(stage["cmd"], check=True)
+    return stage_hash(stage)
+
+
+def main(stages="all", workers=2, force=False, dry_run=False):
+    selected = [s["name"] for s in STAGES] if stages in (None, "all") else [x.strip() for x in stages.split(",")]
+    by_name = {s["name"]: s for s in STAGES}
+    unknown = set(selected) - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    deps = dependencies(STAGES)
+    state = load_state()
+    done, failed = set(), set()
+    # with --dry_run, stages that would run; their dependents would run after them
+    would_run = set()
+    pending = [name for name in by_name if name in selected]
+    # stages outside the selection count as done
+    done.update(name for name in by_name if name not in selected)
+
+    with ThreadPoolExecutor(int(workers)) as pool:
+        running = {}
+        while pending or running:
+            for name in list(pending):
+                if not deps[name] <= done:
+                    if deps[name] & failed:
+                        pending.remove(name)
+                        failed.add(name)
+                        print(f"[{name}] skipped, an upstream stage failed")
+                    continue
+                pending.remove(name)
+                stage = by_name[name]
+                if not force and not deps[name] & would_run and is_current(stage, state):
+                    print(f"[{name}] up to date")
+                    done.add(name)
+                elif dry_run:
+                    print(f"[{name}] would run")
+                    would_run.add(name)
+                    done.add(name)
+                else:
+                    running[pool.submit(run_stage, stage)] = name
+            if not running:
+                if pending and not any(deps[n] <= done for n in pending):
+                    break
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    state[name] = future.result()
+                    save_state(state)
+                    done.add(name)
+                except (subprocess.CalledProcessError, OSError) as err:
+                    print(f"[{name}] failed: {err}")
+                    failed.add(name)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--stages"], opt["--workers"], opt["--force"], opt["--dry_run"])
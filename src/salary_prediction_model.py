@@ -3,71 +3,133 @@
 
 """Builds multiple regression model to predict salary based on features
 
-Usage: src/salary_prediction_model.py --train=<train> --out_dir=<out_dir> --test=<test>
+Usage: src/salary_prediction_model.py --train=<train> --out_dir=<out_dir> --test=<test> [--sparse] [--multi_hot] [--tuning=<tuning>] [--n_jobs=<n_jobs>] [--backend=<backend>] [--blas_threads=<blas_threads>]
   
 Options:
---train=<train>     Path (including filename) to training data (which needs to be saved as a csv file)
+--train=<train>     Path (including filename) to training data (csv, parquet or feather file)
 --out_dir=<out_dir> Path to directory where the serialized model should be written
-[--test=<test>]     Path (including filename) to test data (which needs to be saved as a csv file)
+[--test=<test>]     Path (including filename) to test data (csv, parquet or feather file)
+--sparse            Keep the one-hot encoded design matrix sparse (CSR) end to end
+--multi_hot         Encode DevType and LanguageWorkedWith with one column per answer instead of per combination
+--tuning=<tuning>   Alpha search: "random" (RandomizedSearchCV) or "path" (closed-form regularization path) [default: random]
+--n_jobs=<n_jobs>          Number of cross-validation workers, -1 uses every core [default: -1]
+--backend=<backend>        joblib backend of the workers: loky (processes), multiprocessing or threading [default: loky]
+--blas_threads=<blas_threads>  Cap on BLAS/OpenMP threads per worker, avoids oversubscribing the host
 """
 
-import os
-import sys
-from hashlib import sha1
-
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-from sklearn import datasets
-from sklearn.compose import ColumnTransformer, make_column_transformer
-from sklearn.dummy import DummyClassifier, DummyRegressor
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.linear_model import LogisticRegression, Ridge
-from sklearn.metrics import (
-    accuracy_score,
-    classification_report,
-    confusion_matrix,
-    f1_score,
-    make_scorer,
-    precision_score,
-    recall_score,
-    average_precision_score, 
-    auc
-)
-from sklearn.model_selection import (
-    GridSearchCV,
-    RandomizedSearchCV,
-    cross_val_score,
-    cross_validate,
-    train_test_split,
-)
-from sklearn.pipeline import Pipeline, make_pipeline
-from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
-from sklearn.svm import SVC, SVR
-from sklearn.impute import SimpleImputer
-from sklearn.metrics import ConfusionMatrixDisplay
-from scipy.stats import expon, lognorm, loguniform, randint, uniform
-from sklearn.metrics import PrecisionRecallDisplay, RocCurveDisplay
-import altair as alt
-from joblib import dump, load
+# scikit-learn, pandas and matplotlib are imported in the functions that use them,
+# so `--help` and callers that only need `make_preprocessor` start quickly
+from contextlib import contextmanager
 
 from docopt import docopt
-import zipfile
-import requests
-from io import BytesIO
 
-opt = docopt(__doc__)
+from instrument import phase, stage
+
+# id column written by preprocessing.py, the rows of one respondent share a CV fold
+RESPONDENT = "Respondent"
+
 train = "data/processed/training.csv"
 test = "data/processed/test.csv"
 out_dir = "results"
 
-def main(train, out_dir, test=None):
-    train_df = pd.read_csv(train)
-    if test:
-        test_df = pd.read_csv(test)
+def main(train, out_dir, test=None, sparse=False, multi_hot=False, tuning="random",
+         n_jobs=-1, backend="loky", blas_threads=None):
+    from data_io import read_data
+
+    with stage("model") as st:
+        with phase("read") as p:
+            train_df = read_data(train)
+            if test:
+                test_df = read_data(test)
+            else:
+                test_df = None
+            p.rows_out = len(train_df)
+        st.rows_in = len(train_df)
+        build_model(train_df, out_dir, test_df, sparse, multi_hot, tuning, n_jobs=int(n_jobs), backend=backend,
+                    blas_threads=int(blas_threads) if blas_threads else None)
+
+
+def _limit_worker_threads(blas_threads):
+    # runs once in every multiprocessing worker; spawned workers do not inherit the cap
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(limits=blas_threads)
+
+
+@contextmanager
+def parallel_config(n_jobs=-1, backend="loky", blas_threads=None):
+    """
+    Select the joblib backend of the search and cap BLAS threads per worker
+
+    The cap is applied to this process's thread pools, which run the refit, the
+    eigendecomposition of the path search and every `n_jobs=1` fit, and thus to the
+    threading backend. Loky workers get it through `inner_max_num_threads`; multiprocessing
+    workers apply it themselves when the pool starts them.
+
+    Parameters
+    ----------
+    n_jobs : int
+        number of workers, -1 uses every core
+    backend : str
+        "loky", "multiprocessing" or "threading"
+    blas_threads : int, optional
+        maximum number of BLAS/OpenMP threads each worker may use
+    """
+    from joblib import parallel_backend
+    from threadpoolctl import threadpool_limits
+
+    options = {}
+    if backend == "loky" and blas_threads:
+        options["inner_max_num_threads"] = blas_threads
+    elif backend == "multiprocessing" and blas_threads:
+        # joblib only supports inner_max_num_threads with loky, these go to multiprocessing.Pool
+        options["initializer"] = _limit_worker_threads
+        options["initargs"] = (blas_threads,)
+    with parallel_backend(backend, n_jobs=n_jobs, **options), threadpool_limits(limits=blas_threads):
+        yield
+
+
+def make_preprocessor(sparse=False, multi_hot=False):
+    """
+    Build the column transformer shared by every model
+
+    Parameters
+    ----------
+    sparse : bool
+        return a sparse CSR matrix instead of a dense array
+    multi_hot : bool
+        split DevType and LanguageWorkedWith on `;` and encode one column per answer
+
+    Returns
+    -------
+    ColumnTransformer
+        imputes and scales YearsCodePro, imputes and one-hot encodes the categorical features
+    """
+    from sklearn.compose import make_column_transformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    numeric_features = ["YearsCodePro"]
+    categorical_features = ["DevType", "EdLevel", "LanguageWorkedWith"]
+
+    numeric_transformer = make_pipeline(SimpleImputer(), StandardScaler())
+    categorical_transformer = make_pipeline(SimpleImputer(strategy="constant", fill_value="missing"),
+                                           OneHotEncoder(sparse=sparse, handle_unknown="ignore"))
+
+    transformers = [(numeric_transformer, numeric_features)]
+    if multi_hot:
+        from multi_hot import MultiHotEncoder
+
+        transformers += [
+            (categorical_transformer, ["EdLevel"]),
+            (MultiHotEncoder(sparse=sparse), ["DevType", "LanguageWorkedWith"]),
+        ]
     else:
-        test_df = None
-    build_model(train_df, out_dir, test_df)
+        transformers.append((categorical_transformer, categorical_features))
+
+    # a threshold of 1 keeps the stacked output sparse whenever any block is sparse
+    return make_column_transformer(*transformers, sparse_threshold=1.0 if sparse else 0.0)
 
 """
     Build a regression model to predict salaries
@@ -75,67 +137,94 @@ def main(train, out_dir, test=None):
     Parameters
     ----------
     train_df : dataframe
-       the training set as a dataframe
+       the training set as a dataframe; with a `Respondent` column the rows of a
+       respondent are kept in the same cross-validation fold
     out_dir: str
         the directory in which the results will be saved
     test_df: dataframe
         the testing data that the final selected model will be tested on
+    sparse: bool
+        keep the encoded design matrix sparse and fit Ridge with a CSR-aware solver
+    multi_hot: bool
+        encode DevType and LanguageWorkedWith per answer instead of per combination
+    tuning: str
+        "random" for RandomizedSearchCV, "path" to preprocess each fold once and
+        compute every alpha from one eigendecomposition
+    n_jobs: int
+        number of cross-validation workers, -1 uses every core
+    backend: str
+        joblib backend of the workers: "loky", "multiprocessing" or "threading"
+    blas_threads: int
+        cap on BLAS/OpenMP threads per worker
 
 """
-def build_model(train_df, out_dir, test_df=None):
-    X_train = train_df.drop(columns=["ConvertedComp"])
+def build_model(train_df, out_dir, test_df=None, sparse=False, multi_hot=False, tuning="random",
+                n_jobs=-1, backend="loky", blas_threads=None):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import pandas as pd
+    from joblib import dump
+    from sklearn.linear_model import Ridge
+    from sklearn.model_selection import GroupKFold, RandomizedSearchCV
+    from sklearn.pipeline import make_pipeline
+
+    from ridge_path import RidgePathSearch
+
+    X_train = train_df.drop(columns=["ConvertedComp", RESPONDENT], errors="ignore")
     y_train = train_df["ConvertedComp"]
+    # a respondent with several roles has one row per role, keep them out of each other's folds
+    groups = train_df[RESPONDENT] if RESPONDENT in train_df else None
+    cv = GroupKFold(n_splits=5) if groups is not None else 5
     results = {}
-    numeric_features = ["YearsCodePro"]
-    categorical_features = ["DevType", "EdLevel", "LanguageWorkedWith"]
 
-    numeric_transformer = make_pipeline(SimpleImputer(), StandardScaler())
-    categorical_transformer = make_pipeline(SimpleImputer(strategy="constant", fill_value="missing"),
-                                           OneHotEncoder(sparse=False, handle_unknown="ignore"))
-
-    preprocessor = make_column_transformer(
-        (numeric_transformer, numeric_features),
-        (categorical_transformer, categorical_features)
-    )
+    preprocessor = make_preprocessor(sparse, multi_hot)
 
     # Carry out hyper-parameter tuning
     print("Carrying out hyper-parameter tuning")
-    pipe = make_pipeline(preprocessor, Ridge())
+    pipe = make_pipeline(preprocessor, Ridge(solver="sparse_cg" if sparse else "auto"))
 
     param_grid = {
         "ridge__alpha": np.logspace(-3, 5)
     }
 
-    random_search = RandomizedSearchCV(
-        pipe,
-        param_distributions=param_grid,
-        n_jobs=-1,
-        n_iter=50,
-        cv=5,
-        random_state=123,
-        return_train_score=True
-    )
-    random_search.fit(X_train, y_train)
+    if tuning == "path":
+        random_search = RidgePathSearch(pipe, alphas=param_grid["ridge__alpha"], cv=cv)
+    else:
+        random_search = RandomizedSearchCV(
+            pipe,
+            param_distributions=param_grid,
+            n_jobs=n_jobs,
+            n_iter=50,
+            cv=cv,
+            random_state=123,
+            return_train_score=True
+        )
+    with phase("search", rows_in=len(X_train)), parallel_config(n_jobs, backend, blas_threads):
+        random_search.fit(X_train, y_train, groups=groups)
 
     # Create hyper-parameter tuning plot and save
-    cv_df = pd.DataFrame(random_search.cv_results_)[["param_ridge__alpha", 
-                                                     "mean_test_score", "mean_train_score"]]
-    cv_df.set_index("param_ridge__alpha").plot(logx=True)
-    plt.xlabel("Alpha")
-    plt.ylabel("Score")
-    plt.savefig(f"{out_dir}/alpha-tuning.png")
+    with phase("plot"):
+        cv_df = pd.DataFrame(random_search.cv_results_)[["param_ridge__alpha", 
+                                                         "mean_test_score", "mean_train_score"]]
+        cv_df.set_index("param_ridge__alpha").plot(logx=True)
+        plt.xlabel("Alpha")
+        plt.ylabel("Score")
+        plt.savefig(f"{out_dir}/alpha-tuning.png")
 
     best_model = random_search
 
     print(f"Saving best model to {out_dir}")
-    dump(best_model, f'{out_dir}/best_model_pipe.joblib')
+    with phase("dump"):
+        dump(best_model, f'{out_dir}/best_model_pipe.joblib')
 
     # for test data set
-    if len(test_df) > 0:
-        X_test = test_df.drop(columns=["ConvertedComp"])
+    if test_df is not None and len(test_df) > 0:
+        X_test = test_df.drop(columns=["ConvertedComp", RESPONDENT], errors="ignore")
         y_test = test_df["ConvertedComp"]
-        r_test = random_search.score(X_test, y_test)
-        y_predict = random_search.predict(X_test)
+        with phase("test_scoring", rows_in=len(X_test)) as p:
+            r_test = random_search.score(X_test, y_test)
+            y_predict = random_search.predict(X_test)
+            p.rows_out = len(y_predict)
 
         dummy_result = {}
         dummy_result["r_sq_test"] = r_test
@@ -147,4 +236,6 @@ def build_model(train_df, out_dir, test_df=None):
 
 
 if __name__ == "__main__":
-    main(opt["--train"], opt["--out_dir"], opt["--test"])
+    opt = docopt(__doc__)
+    main(opt["--train"], opt["--out_dir"], opt["--test"], opt["--sparse"], opt["--multi_hot"], opt["--tuning"],
+         opt["--n_jobs"], opt["--backend"], opt["--blas_threads"])
@@ -0,0 +1,179 @@
+"""Precomputes salary predictions for the whole categorical grid and answers lookups from disk.
+
+The model is linear over one-hot/multi-hot categories plus one standardized numeric
+feature, so every prediction is the intercept plus one contribution per feature. The
+table stores those contributions per dimension (`values.npy`, memory-mapped on load) with
+a label index per dimension in `meta.json`; a lookup is a handful of dictionary and
+array reads. With --full_grid the dense (DevType, EdLevel, LanguageWorkedWith,
+YearsCodePro) array of predictions is also written to `grid.npy`; for multi-hot columns
+that axis holds single answers rather than combinations.
+
+Usage: src/salary_table.py --model=<model> --out_dir=<out_dir> [--max_years=<max_years>] [--full_grid]
+
+Options:
+--model=<model>           Path to the serialized model or to a compact model directory
+--out_dir=<out_dir>       Directory the table is written to
+--max_years=<max_years>   Largest YearsCodePro in the table [default: 50]
+--full_grid               Also materialize every combination into grid.npy
+"""
+
+import json
+import os
+
+import numpy as np
+
+from compact_model import MISSING, CompactPredictor, _is_missing
+
+GRID_COLUMNS = ["DevType", "EdLevel", "LanguageWorkedWith"]
+
+
+class SalaryTable:
+    """
+    Per-dimension contributions of a linear salary model
+
+    Parameters
+    ----------
+    meta : dict
+        the contents of `meta.json`
+    values : array
+        the concatenated contributions of every dimension
+    """
+
+    def __init__(self, meta, values):
+        self.meta = meta
+        self.values = values
+        self._labels = {dim["column"]: {label: i for i, label in enumerate(dim["labels"])}
+                        for dim in meta["dimensions"]}
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(meta, np.load(os.path.join(path, "values.npy"), mmap_mode="r"))
+
+    def _contribution(self, dim, value):
+        labels = self._labels[dim["column"]]
+        # missing answers are treated exactly as CompactPredictor treats them
+        if dim["encoding"] == "multihot":
+            answers = set() if _is_missing(value) else set(str(value).split(dim["sep"]))
+        else:
+            answers = [MISSING if _is_missing(value) else str(value)]
+        total = 0.0
+        for answer in answers:
+            i = labels.get(answer)
+            if i is not None:
+                total += self.values[dim["offset"] + i]
+        return total
+
+    def lookup(self, DevType, EdLevel, LanguageWorkedWith, YearsCodePro):
+        """
+        Predicted salary of one profile
+
+        Parameters
+        ----------
+        DevType, EdLevel, LanguageWorkedWith : str
+            the categorical answers of the profile
+        YearsCodePro : int or float
+            professional coding years, None or NaN is imputed like the model does
+
+        Returns
+        -------
+        float
+            the predicted annual compensation
+        """
+        years = self.meta["years"]
+        if _is_missing(YearsCodePro):
+            YearsCodePro = years.get("fill", years["mean"])
+        YearsCodePro = float(YearsCodePro)
+        if YearsCodePro.is_integer() and 1 <= YearsCodePro <= years["max"]:
+            year_part = self.values[years["offset"] + int(YearsCodePro) - 1]
+        else:
+            year_part = years["weight"] * (YearsCodePro - years["mean"]) / years["scale"]
+        profile = {"DevType": DevType, "EdLevel": EdLevel, "LanguageWorkedWith": LanguageWorkedWith}
+        return self.meta["intercept"] + year_part + sum(
+            self._contribution(dim, profile[dim["column"]]) for dim in self.meta["dimensions"]
+        )
+
+
+def build_table(compact, out_dir, max_years=50, full_grid=False):
+    """
+    Write the lookup table of a compact model
+
+    Parameters
+    ----------
+    compact : CompactPredictor
+        the flattened model
+    out_dir : str
+        directory the table is written to
+    max_years : int
+        largest YearsCodePro precomputed
+    full_grid : bool
+        also write every combination of the dimensions into `grid.npy`
+
+    Returns
+    -------
+    SalaryTable
+        the table
+    """
+    meta = compact.meta
+    weights = np.asarray(compact.weights)
+    num = next(n for n in meta["numeric"] if n["column"] == "YearsCodePro")
+
+    years = np.arange(1, max_years + 1, dtype=np.float64)
+    parts = [weights[num["index"]] * (years - num["mean"]) / num["scale"]]
+    table_meta = {
+        "intercept": meta["intercept"],
+        "years": {"offset": 0, "max": max_years, "weight": float(weights[num["index"]]),
+                  "mean": num["mean"], "scale": num["scale"], "fill": num["fill"]},
+        "dimensions": [],
+    }
+
+    offset = max_years
+    for cat in meta["categorical"]:
+        labels = sorted(cat["index"], key=cat["index"].get)
+        parts.append(weights[[cat["index"][label] for label in labels]])
+        dim = {"column": cat["column"], "encoding": cat["encoding"], "labels": labels, "offset": offset}
+        if cat["encoding"] == "multihot":
+            dim["sep"] = cat["sep"]
+        table_meta["dimensions"].append(dim)
+        offset += len(labels)
+
+    os.makedirs(out_dir, exist_ok=True)
+    values = np.concatenate(parts)
+    np.save(os.path.join(out_dir, "values.npy"), values)
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(table_meta, f)
+
+    if full_grid:
+        dims = {d["column"]: d for d in table_meta["dimensions"]}
+        axes = [values[dims[c]["offset"]:dims[c]["offset"] + len(dims[c]["labels"])] for c in GRID_COLUMNS]
+        year_part = values[:max_years]
+        grid = np.lib.format.open_memmap(os.path.join(out_dir, "grid.npy"), mode="w+", dtype=np.float32,
+                                         shape=tuple(len(a) for a in axes) + (max_years,))
+        # fill one DevType slice at a time so memory stays bounded by a slice
+        for i, dev in enumerate(axes[0]):
+            grid[i] = (table_meta["intercept"] + dev + axes[1][:, None, None]
+                       + axes[2][None, :, None] + year_part[None, None, :])
+        grid.flush()
+
+    return SalaryTable(table_meta, values)
+
+
+def main(model, out_dir, max_years=50, full_grid=False):
+    if os.path.isdir(model):
+        compact = CompactPredictor.load(model)
+    else:
+        from joblib import load
+
+        from compact_model import export
+
+        compact = export(load(model))
+    build_table(compact, out_dir, int(max_years), full_grid)
+    print(f"Saved salary table to {out_dir}")
+
+
+if __name__ == "__main__":
+    from docopt import docopt
+
+    opt = docopt(__doc__)
+    main(opt["--model"], opt["--out_dir"], opt["--max_years"], opt["--full_grid"])
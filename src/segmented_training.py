@@ -0,0 +1,229 @@
+"""Trains one salary model per country (and optionally per developer role family) in parallel.
+
+The processed data (written by preprocessing.py with several --countries) is split into
+segments, each segment is fitted with `build_model` in its own process, and a registry
+maps every segment to its model. Training only some segments updates their registry
+entries and keeps the others, so adding a country does not retrain the rest.
+`SegmentRouter` sends each profile to its segment's model, loading models on first use.
+Segments with fewer than --min_rows training rows are skipped, and a segment whose
+training fails is reported without losing the segments that trained.
+
+Usage: src/segmented_training.py --train=<train> --out_dir=<out_dir> [--test=<test>] [--by_dev_family] [--segments=<segments>] [--workers=<workers>] [--tuning=<tuning>] [--min_rows=<min_rows>]
+
+Options:
+--train=<train>           Path (including filename) to training data with a Country column
+--out_dir=<out_dir>       Directory where the segment models and registry.json are written
+--test=<test>             Path (including filename) to test data, scored per segment
+--by_dev_family           Also split each country by developer role family (the part of DevType before the first comma)
+--segments=<segments>     Comma separated segment names to (re)train, e.g. "United States" [default: all]
+--workers=<workers>       Number of segments trained at the same time [default: 4]
+--tuning=<tuning>         Alpha search used by build_model, "random" or "path" [default: path]
+--min_rows=<min_rows>     Segments with fewer training rows are not trained [default: 50]
+"""
+
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from docopt import docopt
+
+from instrument import phase, stage
+
+REGISTRY = "registry.json"
+SEPARATOR = " | "
+# build_model cross-validates with 5 folds, smaller segments cannot be fitted at all
+MIN_ROWS = 50
+
+
+def dev_family(dev_type):
+    """
+    Role family of a DevType answer, e.g. "Developer" for "Developer, back-end"
+
+    Parameters
+    ----------
+    dev_type : str
+        a DevType answer; for `;` joined answers the first role is used
+
+    Returns
+    -------
+    str
+        the family
+    """
+    if not isinstance(dev_type, str) or not dev_type:
+        return "missing"
+    return dev_type.split(";")[0].split(",")[0].strip()
+
+
+def segment_keys(df, by_dev_family=False):
+    """
+    Segment name of every row
+
+    Parameters
+    ----------
+    df : dataframe
+        rows with a Country column
+    by_dev_family : bool
+        also split by developer role family
+
+    Returns
+    -------
+    series
+        the segment name per row
+    """
+    keys = df["Country"].astype(str)
+    if by_dev_family:
+        keys = keys + SEPARATOR + df["DevType"].map(dev_family)
+    return keys
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def train_segment(name, train_df, test_df, segment_dir, tuning="path"):
+    """
+    Fit and save the model of one segment
+
+    Parameters
+    ----------
+    name : str
+        the segment name
+    train_df : dataframe
+        the segment's training rows
+    test_df : dataframe or None
+        the segment's test rows
+    segment_dir : str
+        where the segment's model is written
+    tuning : str
+        alpha search used by build_model
+
+    Returns
+    -------
+    dict
+        the registry entry of the segment
+    """
+    from joblib import load
+
+    from salary_prediction_model import build_model
+
+    os.makedirs(segment_dir, exist_ok=True)
+    # one worker per segment, the segments themselves run in parallel
+    build_model(train_df.drop(columns=["Country"]), segment_dir,
+                None if test_df is None else test_df.drop(columns=["Country"]),
+                tuning=tuning, n_jobs=1, blas_threads=1)
+    entry = {"model": os.path.join(os.path.basename(segment_dir), "best_model_pipe.joblib"),
+             "rows": len(train_df)}
+    result = os.path.join(segment_dir, "test_result.joblib")
+    if test_df is not None and len(test_df) and os.path.exists(result):
+        entry["r_sq_test"] = float(load(result)["r_sq_test"])
+    return entry
+
+
+def load_registry(out_dir):
+    try:
+        with open(os.path.join(out_dir, REGISTRY)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"by_dev_family": None, "segments": {}}
+
+
+class SegmentRouter:
+    """
+    Route profiles to the model of their segment
+
+    Parameters
+    ----------
+    out_dir : str
+        the directory holding registry.json and the segment models
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.registry = load_registry(out_dir)
+        self._models = {}
+
+    def model(self, segment):
+        if segment not in self._models:
+            from joblib import load
+
+            entry = self.registry["segments"][segment]
+            self._models[segment] = load(os.path.join(self.out_dir, entry["model"]))
+        return self._models[segment]
+
+    def predict(self, X):
+        import numpy as np
+
+        keys = segment_keys(X, bool(self.registry["by_dev_family"])).to_numpy()
+        predictions = np.full(len(X), np.nan)
+        for segment in np.unique(keys):
+            if segment not in self.registry["segments"]:
+                # no model for this segment, its predictions stay NaN
+                continue
+            rows = keys == segment
+            predictions[rows] = self.model(segment).predict(X[rows])
+        return predictions
+
+
+def main(train, out_dir, test=None, by_dev_family=False, segments="all", workers=4, tuning="path",
+         min_rows=MIN_ROWS):
+    from data_io import read_data
+
+    with stage("segmented_training") as st:
+        with phase("read") as p:
+            train_df = read_data(train)
+            test_df = read_data(test) if test else None
+            p.rows_out = len(train_df)
+        st.rows_in = len(train_df)
+
+        registry = load_registry(out_dir)
+        if registry["segments"] and registry["by_dev_family"] != by_dev_family:
+            raise ValueError("The existing registry was built with a different --by_dev_family setting")
+        registry["by_dev_family"] = by_dev_family
+
+        train_keys = segment_keys(train_df, by_dev_family)
+        test_keys = segment_keys(test_df, by_dev_family) if test_df is not None else None
+        names = sorted(train_keys.unique())
+        if segments not in (None, "all"):
+            wanted = {s.strip() for s in segments.split(",")}
+            names = [n for n in names if n in wanted or n.split(SEPARATOR)[0] in wanted]
+
+        sizes = train_keys.value_counts()
+        small = [name for name in names if sizes[name] < max(int(min_rows), 5)]
+        for name in small:
+            print(f"Skipping segment {name!r}: only {sizes[name]} training rows")
+        names = [name for name in names if name not in small]
+
+        def test_rows(name):
+            rows = None if test_df is None else test_df[test_keys == name]
+            return rows if rows is not None and len(rows) else None
+
+        failed = {}
+        with phase("train", rows_in=len(train_df)), ProcessPoolExecutor(int(workers)) as pool:
+            futures = {
+                name: pool.submit(train_segment, name, train_df[train_keys == name],
+                                  test_rows(name), os.path.join(out_dir, _slug(name)), tuning)
+                for name in names
+            }
+            for name, future in futures.items():
+                try:
+                    registry["segments"][name] = future.result()
+                except Exception as err:
+                    failed[name] = err
+                    print(f"Could not train segment {name!r}: {err}")
+                    continue
+                print(f"Trained segment {name!r} on {registry['segments'][name]['rows']} rows")
+
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, REGISTRY), "w") as f:
+            json.dump(registry, f, indent=2)
+
+    if failed:
+        sys.exit(f"Failed to train {len(failed)} of {len(names)} segments: {sorted(failed)}")
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--train"], opt["--out_dir"], opt["--test"], opt["--by_dev_family"], opt["--segments"],
+         opt["--workers"], opt["--tuning"], opt["--min_rows"])
@@ -0,0 +1,251 @@
+"""Serves salary predictions over HTTP from a model loaded once at start-up.
+
+Concurrent requests are queued and scored together in micro-batches, so one pandas
+`ColumnTransformer` pass is shared by every profile that arrives within the batching
+window.
+
+POST /predict   body: one profile or a list of profiles as json, e.g.
+                {"YearsCodePro": 5, "DevType": "Developer, back-end",
+                 "EdLevel": "Bachelor’s degree (BA, BS, B.Eng., etc.)",
+                 "LanguageWorkedWith": "Python;SQL"}
+                returns {"predictions": [...]}
+GET  /metrics   request count, batch count, mean batch size, p50/p99 latency in ms and,
+                with --cache_entries, prediction cache hits and misses
+
+Usage: src/serve.py --model=<model> [--host=<host>] [--port=<port>] [--max_batch=<max_batch>] [--max_wait_ms=<max_wait_ms>] [--cache_entries=<cache_entries>] [--cache_ttl=<cache_ttl>]
+
+Options:
+--model=<model>               Path to the serialized model (e.g. results/best_model_pipe.joblib)
+--host=<host>                 Interface to listen on [default: 127.0.0.1]
+--port=<port>                 Port to listen on [default: 8000]
+--max_batch=<max_batch>       Maximum number of profiles scored in one batch [default: 256]
+--max_wait_ms=<max_wait_ms>   Longest time a profile waits for its batch to fill [default: 5]
+--cache_entries=<cache_entries>  Number of profiles whose predictions are memoized, 0 disables the cache [default: 0]
+--cache_ttl=<cache_ttl>       Seconds after which a memoized prediction is recomputed
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from docopt import docopt
+from joblib import load
+
+from prediction_cache import CachedPredictor
+
+FEATURES = ["YearsCodePro", "DevType", "EdLevel", "LanguageWorkedWith"]
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error"}
+
+
+class MicroBatcher:
+    """
+    Collect profiles from concurrent requests and score them in batches
+
+    Parameters
+    ----------
+    model : estimator
+        any object with a `predict` method taking a dataframe of `FEATURES`
+    max_batch : int
+        maximum number of profiles per batch
+    max_wait_ms : float
+        how long the first profile of a batch waits for others to arrive
+    window : int
+        number of recent request latencies kept for the percentiles
+    """
+
+    def __init__(self, model, max_batch=256, max_wait_ms=5, window=10000):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.batched_profiles = 0
+
+    async def predict(self, profiles):
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in profiles]
+        for profile, future in zip(profiles, futures):
+            self.queue.put_nowait((profile, future))
+        return await asyncio.gather(*futures)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batches += 1
+            self.batched_profiles += len(batch)
+            if not await self._resolve(batch, raise_errors=len(batch) == 1):
+                # one bad profile must not fail the others, so score them one by one
+                for item in batch:
+                    await self._resolve([item], raise_errors=True)
+
+    async def _resolve(self, batch, raise_errors):
+        loop = asyncio.get_running_loop()
+        try:
+            frame = pd.DataFrame([profile for profile, _ in batch], columns=FEATURES)
+            # the model runs in a worker thread so the loop keeps accepting requests
+            predictions = await loop.run_in_executor(None, self.model.predict, frame)
+        except Exception as err:
+            if not raise_errors:
+                return False
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return True
+        for (_, future), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result(float(prediction))
+        return True
+
+    def metrics(self):
+        latencies = np.asarray(self.latencies) * 1000
+        cache = self.model.stats() if isinstance(self.model, CachedPredictor) else None
+        return {
+            "cache": cache,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_profiles / self.batches if self.batches else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        }
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise ValueError(f"malformed request line {request_line!r}") from None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise ValueError(f"invalid Content-Length {headers['content-length']!r}") from None
+    if length < 0:
+        raise ValueError(f"invalid Content-Length {length}")
+    body = await reader.readexactly(length)
+    return method, path, headers, body
+
+
+def _response(status, payload, keep_alive=True):
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+def make_handler(batcher):
+    """
+    Build the connection handler passed to `asyncio.start_server`
+
+    Parameters
+    ----------
+    batcher : MicroBatcher
+        the batcher that scores the profiles
+
+    Returns
+    -------
+    coroutine function
+        handles the HTTP/1.1 requests of one connection
+    """
+    async def handle(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ValueError as err:
+                    # the next request cannot be found in the stream, so answer and close
+                    writer.write(_response(400, {"error": str(err)}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                start = time.perf_counter()
+
+                if path == "/metrics" and method == "GET":
+                    status, payload = 200, batcher.metrics()
+                elif path == "/predict" and method == "POST":
+                    try:
+                        profiles = json.loads(body)
+                        if isinstance(profiles, dict):
+                            profiles = [profiles]
+                        if not isinstance(profiles, list) or not all(isinstance(p, dict) for p in profiles):
+                            raise ValueError("the body must be a profile object or a list of profile objects")
+                        predictions = await batcher.predict(profiles)
+                        status, payload = 200, {"predictions": predictions}
+                        batcher.requests += 1
+                        batcher.latencies.append(time.perf_counter() - start)
+                    except (ValueError, TypeError, KeyError) as err:
+                        status, payload = 400, {"error": str(err)}
+                    except Exception as err:
+                        # the model failed on a well-formed request
+                        status, payload = 500, {"error": f"prediction failed: {err}"}
+                elif path in ("/predict", "/metrics"):
+                    status, payload = 405, {"error": f"{method} not allowed on {path}"}
+                else:
+                    status, payload = 404, {"error": f"unknown path {path}"}
+
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def serve(model, host="127.0.0.1", port=8000, max_batch=256, max_wait_ms=5):
+    batcher = MicroBatcher(model, max_batch, max_wait_ms)
+    worker = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(make_handler(batcher), host, port)
+    print(f"Serving predictions on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        worker.cancel()
+
+
+def main(model, host="127.0.0.1", port=8000, max_batch=256, max_wait_ms=5,
+         cache_entries=0, cache_ttl=None):
+    model = load(model)
+    if int(cache_entries) > 0:
+        model = CachedPredictor(model, int(cache_entries), float(cache_ttl) if cache_ttl else None)
+    asyncio.run(serve(model, host, int(port), int(max_batch), float(max_wait_ms)))
+
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt["--model"], opt["--host"], opt["--port"], opt["--max_batch"], opt["--max_wait_ms"],
+         opt["--cache_entries"], opt["--cache_ttl"])
@@ -0,0 +1,68 @@
+"""Tests of the NumPy-only compact model against the sklearn pipeline it was exported from."""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from joblib import dump
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+
+import compact_model
+from compact_model import FEATURES, CompactPredictor, export
+from ridge_path import RidgePathSearch
+from salary_prediction_model import make_preprocessor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+from synthetic_survey import make_survey  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def survey():
+    df = make_survey(400, seed=5)
+    df.loc[::9, "YearsCodePro"] = np.nan
+    df.loc[::7, "EdLevel"] = np.nan
+    df.loc[::5, "LanguageWorkedWith"] = np.nan
+    return df
+
+
+def unseen_profiles():
+    return [
+        {"YearsCodePro": 4, "DevType": "Astronaut", "EdLevel": "Clown college",
+         "LanguageWorkedWith": "Python;COBOL"},
+        {"YearsCodePro": None, "DevType": None, "EdLevel": None, "LanguageWorkedWith": None},
+    ]
+
+
+@pytest.mark.parametrize("multi_hot", [False, True])
+@pytest.mark.parametrize("sparse", [False, True])
+def test_matches_the_pipeline(survey, multi_hot, sparse):
+    X, y = survey.drop(columns=["ConvertedComp"]), survey["ConvertedComp"]
+    pipe = make_pipeline(make_preprocessor(sparse, multi_hot), Ridge(alpha=2.0)).fit(X, y)
+    compact = export(pipe)
+    np.testing.assert_allclose(compact.predict(X), pipe.predict(X), rtol=1e-9)
+
+    profiles = unseen_profiles()
+    # the pipeline's imputers only recognize NaN, the compact model also takes None as missing
+    frame = pd.DataFrame(profiles, columns=FEATURES).replace({None: np.nan})
+    np.testing.assert_allclose(compact.predict(profiles), pipe.predict(frame), rtol=1e-9)
+    np.testing.assert_allclose(compact.predict(frame), pipe.predict(frame), rtol=1e-9)
+
+
+def test_exports_the_best_estimator_of_a_search(survey):
+    X, y = survey.drop(columns=["ConvertedComp"]), survey["ConvertedComp"]
+    search = RidgePathSearch(make_pipeline(make_preprocessor(), Ridge()), alphas=np.logspace(-2, 3, 6)).fit(X, y)
+    np.testing.assert_allclose(export(search).predict(X), search.predict(X), rtol=1e-9)
+
+
+def test_save_load_and_check(survey, tmp_path):
+    X, y = survey.drop(columns=["ConvertedComp"]), survey["ConvertedComp"]
+    pipe = make_pipeline(make_preprocessor(multi_hot=True), Ridge()).fit(X, y)
+    dump(pipe, tmp_path / "model.joblib")
+    survey.to_csv(tmp_path / "check.csv", index=False)
+    compact_model.main(str(tmp_path / "model.joblib"), str(tmp_path / "compact"), str(tmp_path / "check.csv"))
+    loaded = CompactPredictor.load(str(tmp_path / "compact"))
+    assert isinstance(loaded.weights, np.memmap)
+    np.testing.assert_allclose(loaded.predict(X), pipe.predict(X), rtol=1e-9)
@@ -0,0 +1,169 @@
+"""Tests of the streaming, resuming and caching download against a local HTTP server."""
+
+import hashlib
+import io
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import download_data
+
+CSV = b"Respondent,Country\n" + b"".join(b"%d,Canada\n" % i for i in range(5000))
+
+
+def make_zip(csv=CSV):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr(download_data.MEMBER, csv)
+    return buffer.getvalue()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _head(self, status, length, extra=None):
+        self.send_response(status)
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Content-Length", str(length))
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        if self.path != "/survey.zip":
+            self.send_error(404)
+            return
+        self._head(200, len(self.server.data))
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.path != "/survey.zip":
+            self.send_error(404)
+            return
+        data = self.server.data
+        ranged = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if ranged and (if_range is None or if_range == self.server.etag):
+            start = int(ranged.split("=")[1].rstrip("-"))
+            if start >= len(data):
+                self._head(416, 0, {"Content-Range": f"bytes */{len(data)}"})
+                return
+            self._head(206, len(data) - start, {"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}"})
+            self.wfile.write(data[start:])
+            return
+        self._head(200, len(data))
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.data = make_zip()
+    httpd.etag = '"v1"'
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/survey.zip"
+    yield httpd
+    httpd.shutdown()
+
+
+def test_stream_extracts_member_and_checks_digest(server, tmp_path):
+    digest = hashlib.sha256(server.data).hexdigest()
+    download_data.main(server.url, str(tmp_path), stream=True, sha256=digest)
+    assert (tmp_path / download_data.MEMBER).read_bytes() == CSV
+    assert not os.path.exists(tmp_path / "survey.zip")
+
+
+def test_checksum_mismatch_raises(server, tmp_path):
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        download_data.main(server.url, str(tmp_path), stream=True, sha256="0" * 64)
+
+
+def test_http_error_exits_nonzero(server, tmp_path):
+    with pytest.raises(SystemExit) as exit_info:
+        download_data.main(server.url.replace("survey", "missing"), str(tmp_path), stream=True)
+    assert exit_info.value.code == 1
+
+
+def test_resume_sends_range_with_validator(server, tmp_path):
+    target = str(tmp_path / "survey.zip")
+    half = len(server.data) // 2
+    with open(target + ".part", "wb") as f:
+        f.write(server.data[:half])
+    with open(target + ".part.validator", "w") as f:
+        f.write(server.etag)
+
+    download_data.stream_to_file(server.url, target, chunk_size=1024)
+
+    assert open(target, "rb").read() == server.data
+    assert server.requests[-1]["Range"] == f"bytes={half}-"
+    assert server.requests[-1]["If-Range"] == server.etag
+    assert not os.path.exists(target + ".part.validator")
+
+
+def test_stale_partial_of_changed_file_restarts(server, tmp_path):
+    target = str(tmp_path / "survey.zip")
+    with open(target + ".part", "wb") as f:
+        f.write(b"bytes of an older version")
+    with open(target + ".part.validator", "w") as f:
+        f.write('"v0"')
+
+    download_data.stream_to_file(server.url, target, chunk_size=1024)
+
+    assert open(target, "rb").read() == server.data
+
+
+def test_partial_without_validator_is_not_resumed(server, tmp_path):
+    target = str(tmp_path / "survey.zip")
+    with open(target + ".part", "wb") as f:
+        f.write(server.data[:100])
+
+    download_data.stream_to_file(server.url, target, chunk_size=1024)
+
+    assert "Range" not in server.requests[-1]
+    assert open(target, "rb").read() == server.data
+
+
+def test_complete_partial_is_accepted_on_416(server, tmp_path):
+    target = str(tmp_path / "survey.zip")
+    with open(target + ".part", "wb") as f:
+        f.write(server.data)
+    with open(target + ".part.validator", "w") as f:
+        f.write(server.etag)
+
+    download_data.stream_to_file(server.url, target, chunk_size=1024)
+
+    assert open(target, "rb").read() == server.data
+
+
+def test_cache_downloads_once(server, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = download_data.cached_archive(server.url, cache_dir)
+    second = download_data.cached_archive(server.url, cache_dir)
+
+    assert first == second
+    assert len(server.requests) == 1
+    assert os.path.basename(first) == hashlib.sha256(server.data).hexdigest() + ".zip"
+
+
+def _fetch(url, cache_dir):
+    return download_data.cached_archive(url, cache_dir)
+
+
+def test_cache_shared_between_processes(server, tmp_path):
+    from multiprocessing import get_context
+
+    cache_dir = str(tmp_path / "cache")
+    with get_context("fork").Pool(4) as pool:
+        paths = pool.starmap(_fetch, [(server.url, cache_dir)] * 8)
+
+    assert len(set(paths)) == 1
+    assert open(paths[0], "rb").read() == server.data
+    assert len(server.requests) == 1
+    index = download_data._read_index(cache_dir)
+    assert list(index["objects"]) == [hashlib.sha256(server.data).hexdigest()]
@@ -0,0 +1,76 @@
+"""Tests of the pandas aggregates behind the EDA charts."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import gaussian_kde
+
+import eda
+
+
+@pytest.fixture
+def salaries():
+    rng = np.random.RandomState(7)
+    df = pd.DataFrame({"DevType": np.repeat(["back-end", "front-end", "mobile"], [60, 40, 1]),
+                       "ConvertedComp": rng.lognormal(11, 0.4, size=101)})
+    # one far outlier per large group
+    df.loc[0, "ConvertedComp"] = 2e6
+    df.loc[60, "ConvertedComp"] = 1.0
+    return df
+
+
+def test_box_summary_matches_numpy(salaries):
+    summary = eda.box_summary(salaries, "DevType").set_index("DevType")
+    for name, values in salaries.groupby("DevType")["ConvertedComp"]:
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+        inside = values[(values >= q1 - 1.5 * (q3 - q1)) & (values <= q3 + 1.5 * (q3 - q1))]
+        row = summary.loc[name]
+        assert (row.q1, row["median"], row.q3) == pytest.approx((q1, median, q3))
+        assert (row.lower, row.upper) == pytest.approx((inside.min(), inside.max()))
+
+
+def test_box_summary_accepts_categorical_groups(salaries):
+    plain = eda.box_summary(salaries, "DevType")
+    categorical = eda.box_summary(salaries.astype({"DevType": "category"}), "DevType")
+    pd.testing.assert_frame_equal(plain, categorical)
+
+
+def test_outliers_are_the_rows_beyond_the_whiskers(salaries):
+    summary = eda.box_summary(salaries, "DevType")
+    outliers = eda.box_outliers(salaries, summary, "DevType")
+    assert {(2e6, "back-end"), (1.0, "front-end")} <= set(zip(outliers["ConvertedComp"], outliers["DevType"]))
+    bounds = outliers.join(summary.set_index("DevType"), on="DevType")
+    assert ((bounds.ConvertedComp < bounds.lower) | (bounds.ConvertedComp > bounds.upper)).all()
+
+
+def test_empty_input_gives_empty_aggregates():
+    empty = pd.DataFrame({"DevType": pd.Series([], dtype=str), "ConvertedComp": pd.Series([], dtype=float)})
+    summary = eda.box_summary(empty, "DevType")
+    assert summary.empty and list(summary.columns) == ["DevType", "q1", "median", "q3", "lower", "upper"]
+    assert eda.box_outliers(empty, summary, "DevType").empty
+    assert eda.kde([]).empty
+    # the chart is still built, just without marks
+    eda.box_chart(empty, "DevType", "Job type").to_dict()
+
+
+def test_kde_matches_gaussian_kde_with_vega_bandwidth():
+    values = np.random.RandomState(8).lognormal(11, 0.5, size=5000)
+    density = eda.kde(values)
+    assert len(density) == eda.KDE_STEPS
+    std = values.std(ddof=1)
+    q1, q3 = np.percentile(values, [25, 75])
+    bandwidth = 1.06 * min(std, (q3 - q1) / 1.34) * len(values) ** (-1 / 5)
+    exact = gaussian_kde(values, bw_method=bandwidth / std)(density["ConvertedComp"])
+    np.testing.assert_allclose(density["Density"], exact, rtol=0.02, atol=1e-3 * exact.max())
+
+
+def test_kde_with_zero_spread():
+    density = eda.kde([5.0, 5.0, 5.0])
+    assert np.isfinite(density["Density"]).all() and (density["Density"] > 0).all()
+
+
+def test_charts_build_from_a_training_frame(salaries):
+    train = salaries.assign(EdLevel="Master’s degree (MA, MS, M.Eng., MBA, etc.)",
+                            LanguageWorkedWith="HTML/CSS;JavaScript", YearsCodePro=3)
+    for name, chart in eda.CHARTS.items():
+        assert chart(train).to_dict(), name
@@ -0,0 +1,50 @@
+"""Tests of the stage/phase instrumentation."""
+
+import json
+import multiprocessing
+import threading
+import time
+
+import instrument
+
+
+def test_stage_writes_phases(tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS_DIR", str(tmp_path))
+    with instrument.stage("demo", rows_in=10) as st:
+        with instrument.phase("read") as p:
+            p.rows_out = 5
+        st.rows_out = 5
+    metrics = json.loads((tmp_path / "demo.json").read_text())
+    assert metrics["rows_in"] == 10 and metrics["rows_out"] == 5
+    assert [p["name"] for p in metrics["phases"]] == ["read"]
+    assert metrics["phases"][0]["rows_out"] == 5
+
+
+def test_phase_outside_stage_starts_no_sampler():
+    threads = threading.active_count()
+    with instrument.phase("alone") as p:
+        assert threading.active_count() == threads
+        p.rows_out = 1
+    assert not hasattr(p, "wall_s")
+
+
+def test_missing_resource_module_degrades(tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(instrument, "resource", None)
+    assert instrument.peak_rss_mib() is None
+    with instrument.stage("no_resource"):
+        pass
+    assert json.loads((tmp_path / "no_resource.json").read_text())["max_rss_mib"] is None
+
+
+def test_children_usage_counts_live_children():
+    if instrument.rss_mib() is None:
+        return
+    child = multiprocessing.Process(target=time.sleep, args=(2,))
+    child.start()
+    try:
+        time.sleep(0.2)
+        assert instrument.children_usage()[1] > 0
+    finally:
+        child.terminate()
+        child.join()
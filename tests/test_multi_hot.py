@@ -0,0 +1,55 @@
+"""Tests of the multi-hot encoder of the `;` separated survey answers."""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+from sklearn.base import clone
+
+from multi_hot import MultiHotEncoder
+
+ANSWERS = pd.DataFrame({
+    "LanguageWorkedWith": ["Python;SQL", "SQL", None, "Go;Python;Python", ""],
+    "DevType": ["Developer, back-end", "Data scientist;Developer, back-end", "Student", None, "Student"],
+})
+
+
+def test_one_column_per_answer():
+    encoder = MultiHotEncoder().fit(ANSWERS)
+    assert encoder.vocabularies_ == [["Go", "Python", "SQL"],
+                                     ["Data scientist", "Developer, back-end", "Student"]]
+    assert list(encoder.get_feature_names_out()) == [
+        "LanguageWorkedWith_Go", "LanguageWorkedWith_Python", "LanguageWorkedWith_SQL",
+        "DevType_Data scientist", "DevType_Developer, back-end", "DevType_Student",
+    ]
+
+
+def test_indicators_count_repeated_answers_once():
+    out = MultiHotEncoder(sparse=False).fit(ANSWERS).transform(ANSWERS)
+    np.testing.assert_array_equal(out, [
+        [0, 1, 1, 0, 1, 0],
+        [0, 0, 1, 1, 1, 0],
+        [0, 0, 0, 0, 0, 1],
+        [1, 1, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 1],
+    ])
+
+
+def test_unseen_answers_and_combinations():
+    encoder = MultiHotEncoder(sparse=False).fit(ANSWERS)
+    new = pd.DataFrame({"LanguageWorkedWith": ["Rust;SQL;Go"], "DevType": ["Designer"]})
+    # an unseen combination of known answers is still encoded, unknown answers are ignored
+    np.testing.assert_array_equal(encoder.transform(new), [[1, 0, 1, 0, 0, 0]])
+
+
+def test_sparse_output_matches_dense():
+    encoder = MultiHotEncoder(sparse=True).fit(ANSWERS)
+    out = encoder.transform(ANSWERS)
+    assert sp.isspmatrix_csr(out)
+    np.testing.assert_array_equal(out.toarray(), clone(encoder).set_params(sparse=False).fit(ANSWERS)
+                                  .transform(ANSWERS))
+
+
+def test_custom_separator():
+    df = pd.DataFrame({"a": ["x|y", "y"]})
+    out = MultiHotEncoder(sep="|", sparse=False).fit_transform(df)
+    np.testing.assert_array_equal(out, [[1, 1], [0, 1]])
@@ -0,0 +1,86 @@
+"""Tests of the out-of-core Ridge fit against the in-memory pipeline."""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+
+import out_of_core
+from compact_model import CompactPredictor
+from data_io import write_data
+from salary_prediction_model import make_preprocessor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+from synthetic_survey import make_survey  # noqa: E402
+
+ALPHA = 3.0
+
+
+@pytest.fixture(scope="module")
+def survey():
+    df = make_survey(600, seed=2)
+    # missing answers exercise the imputation of both encodings
+    df.loc[::17, "YearsCodePro"] = np.nan
+    df.loc[::13, "DevType"] = np.nan
+    df.loc[::11, "LanguageWorkedWith"] = np.nan
+    return df
+
+
+@pytest.fixture(params=["csv", "parquet"])
+def train_file(request, survey, tmp_path):
+    path = str(tmp_path / f"training.{request.param}")
+    write_data(survey, path)
+    return path
+
+
+@pytest.mark.parametrize("multi_hot", [False, True])
+def test_matches_in_memory_ridge(survey, train_file, multi_hot):
+    # small chunks so the statistics are accumulated over several chunks and folds
+    vocab = out_of_core.first_pass(train_file, chunksize=97, multi_hot=multi_hot)
+    stats = out_of_core.second_pass(train_file, vocab, chunksize=97)
+    coefs, intercepts = out_of_core.solve(out_of_core.combine(stats), [ALPHA])
+
+    X, y = survey.drop(columns=["ConvertedComp"]), survey["ConvertedComp"]
+    pipe = make_pipeline(make_preprocessor(multi_hot=multi_hot), Ridge(alpha=ALPHA)).fit(X, y)
+    assert coefs.shape[0] == pipe[-1].coef_.shape[0]
+    np.testing.assert_allclose(coefs[:, 0], pipe[-1].coef_, rtol=1e-6, atol=1e-6)
+    assert intercepts[0] == pytest.approx(pipe[-1].intercept_)
+
+    model = out_of_core.to_compact(vocab, coefs[:, 0], intercepts[0])
+    np.testing.assert_allclose(model.predict(X), pipe.predict(X), rtol=1e-6)
+
+
+def test_multi_hot_width_is_the_answer_vocabulary(train_file, survey):
+    vocab = out_of_core.first_pass(train_file, multi_hot=True)
+    answers = survey["LanguageWorkedWith"].dropna().str.split(";").explode().unique()
+    assert vocab["categories"]["LanguageWorkedWith"] == sorted(answers)
+    assert [col for col, _ in vocab["encodings"]] == ["EdLevel", "DevType", "LanguageWorkedWith"]
+
+
+def test_cross_validation_uses_kfold_blocks(train_file):
+    vocab = out_of_core.first_pass(train_file)
+    stats = out_of_core.second_pass(train_file, vocab)
+    assert [s["n"] for s in stats] == list(np.diff(out_of_core.fold_bounds(vocab["n"])))
+    cv_df = out_of_core.cross_validate(stats, out_of_core.ALPHAS[:5])
+    assert (cv_df["mean_train_score"] >= cv_df["mean_test_score"]).all()
+
+
+def test_main_writes_model_and_scores_test(train_file, survey, tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS_DIR", str(tmp_path / "metrics"))
+    out_dir = tmp_path / "out"
+    out_of_core.main(train_file, str(out_dir), test=train_file, alpha=ALPHA, multi_hot=True)
+    summary = json.loads((out_dir / "out_of_core_summary.json").read_text())
+    assert summary["rows"] == len(survey) and 0 < summary["r_sq_test"] < 1
+    model = CompactPredictor.load(str(out_dir / "compact_model"))
+    assert np.isfinite(model.predict(survey.iloc[:5])).all()
+
+
+def test_feather_is_rejected(survey, tmp_path):
+    path = str(tmp_path / "training.feather")
+    write_data(survey, path)
+    with pytest.raises(ValueError, match="csv or parquet"):
+        out_of_core.first_pass(path)
@@ -0,0 +1,49 @@
+"""Tests of batch scoring with predict.py."""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from joblib import dump
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+
+import predict
+from data_io import write_data
+from salary_prediction_model import make_preprocessor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+from synthetic_survey import make_survey  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def fitted(tmp_path_factory):
+    df = make_survey(300, seed=3)
+    model = make_pipeline(make_preprocessor(), Ridge()).fit(df.drop(columns=["ConvertedComp"]),
+                                                            df["ConvertedComp"])
+    path = tmp_path_factory.mktemp("model") / "model.joblib"
+    dump(model, path)
+    return str(path), model, df
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_scores_every_format_in_chunks(fitted, fmt, workers, tmp_path):
+    model_path, model, df = fitted
+    source = str(tmp_path / f"profiles.{fmt}")
+    write_data(df, source)
+    assert sum(len(c) for c in predict.iter_chunks(source, 70)) == len(df)
+    assert max(len(c) for c in predict.iter_chunks(source, 70)) <= 70
+
+    output = tmp_path / "predictions.csv"
+    predict.main(model_path, source, str(output), chunksize=70, workers=workers)
+    scored = pd.read_csv(output)
+    assert len(scored) == len(df)
+    np.testing.assert_allclose(scored[predict.PREDICTION], model.predict(df[predict.FEATURES]))
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported data file extension"):
+        next(predict.iter_chunks(str(tmp_path / "profiles.xlsx")))
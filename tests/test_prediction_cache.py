@@ -0,0 +1,77 @@
+"""Tests of the LRU/TTL prediction cache."""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+import prediction_cache
+from prediction_cache import FEATURES, CachedPredictor, profile_key
+
+
+class CountingModel:
+    # predicts YearsCodePro, NaN-aware, and records every frame it is given
+    def __init__(self):
+        self.frames = []
+
+    def predict(self, X):
+        self.frames.append(X.copy())
+        return X["YearsCodePro"].astype(float).fillna(-1.0).to_numpy()
+
+
+def profile(years=3, dev="Developer, back-end", ed="Master’s degree", langs="Python;SQL"):
+    return {"YearsCodePro": years, "DevType": dev, "EdLevel": ed, "LanguageWorkedWith": langs}
+
+
+def test_repeated_profiles_hit_the_cache():
+    model = CountingModel()
+    cache = CachedPredictor(model)
+    assert cache.predict([profile(1), profile(2), profile(1)]) == [1.0, 2.0, 1.0]
+    assert cache.predict([profile(2), profile(1)]) == [2.0, 1.0]
+    # the duplicate within the first call is scored once
+    assert [len(f) for f in model.frames] == [2]
+    assert cache.stats() == {"entries": 2, "hits": 2, "misses": 3, "hit_rate": 0.4}
+
+
+def test_dataframe_input_and_normalized_keys():
+    model = CountingModel()
+    cache = CachedPredictor(model)
+    frame = pd.DataFrame([profile(3), profile(3.0, dev=" Developer, back-end ")], columns=FEATURES)
+    assert cache.predict(frame) == [3.0, 3.0]
+    assert len(model.frames[0]) == 1
+    # the model sees the normalized values the cache is keyed on
+    assert model.frames[0]["DevType"].tolist() == ["Developer, back-end"]
+    assert profile_key(profile(3)) == profile_key(profile(3.0, dev="Developer, back-end "))
+
+
+def test_none_and_nan_are_the_same_missing_answer():
+    model = CountingModel()
+    cache = CachedPredictor(model)
+    assert cache.predict([profile(None), profile(math.nan)]) == [-1.0, -1.0]
+    assert len(model.frames) == 1 and np.isnan(model.frames[0]["YearsCodePro"]).all()
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CachedPredictor(CountingModel(), max_entries=2)
+    cache.predict([profile(1), profile(2)])
+    cache.predict([profile(1)])
+    cache.predict([profile(3)])
+    assert cache.stats()["entries"] == 2
+    hits = cache.hits
+    cache.predict([profile(1), profile(3)])
+    assert cache.hits == hits + 2
+    cache.predict([profile(2)])
+    assert cache.misses == 4
+
+
+def test_expired_entries_are_recomputed(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(prediction_cache.time, "monotonic", lambda: now[0])
+    model = CountingModel()
+    cache = CachedPredictor(model, ttl=10)
+    cache.predict([profile(1)])
+    now[0] += 5
+    cache.predict([profile(1)])
+    now[0] += 11
+    cache.predict([profile(1)])
+    assert len(model.frames) == 2 and cache.hits == 1
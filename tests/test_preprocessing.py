@@ -0,0 +1,87 @@
+"""Tests of the Python preprocessing stage, ported from the checks of preprocessing.R."""
+
+import warnings
+
+import pandas as pd
+import pytest
+
+import preprocessing
+
+
+def raw_rows(n, **overrides):
+    rows = {
+        "Country": ["Canada"] * n,
+        "EdLevel": list("abcdefghij"[:n]),
+        "YearsCodePro": [str(i + 1) for i in range(n)],
+        "LanguageWorkedWith": list("abcdefghij"[:n]),
+        "DevType": list("abcdefghij"[:n]),
+        "ConvertedComp": [str(10 * (i + 1)) for i in range(n)],
+        "Employment": ["Employed full-time"] * n,
+        "Student": ["No"] * n,
+    }
+    rows.update(overrides)
+    return pd.DataFrame(rows)
+
+
+def test_country_column_removed_and_only_full_time_kept():
+    df = raw_rows(3, Employment=["Employed full-time", "Employed part-time", "Employed full-time"])
+    out = preprocessing.filter_chunk(df)
+    assert "Country" not in out.columns
+    assert out["Employment"].unique().tolist() == ["Employed full-time"]
+
+
+def test_students_other_countries_and_open_ended_years_dropped():
+    df = raw_rows(5, Country=["Canada", "Canada", "Canada", "Canada", "France"],
+                  Student=["No", "Yes, full-time", "No", "No", "No"],
+                  YearsCodePro=["3", "4", "Less than 1 year", "More than 50 years", "5"])
+    out = preprocessing.filter_chunk(df)
+    assert out["YearsCodePro"].tolist() == [3.0]
+
+
+def test_several_countries_keep_the_country_column():
+    df = raw_rows(3, Country=["Canada", "France", "Chile"])
+    out = preprocessing.filter_chunk(df, ["Canada", "France"])
+    assert out["Country"].tolist() == ["Canada", "France"]
+
+
+def test_filter_does_not_warn_about_copies():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        preprocessing.filter_chunk(raw_rows(3, DevType=["a;b", "c", "d"]))
+
+
+def test_dev_types_exploded_per_respondent():
+    out = preprocessing.filter_chunk(raw_rows(2, DevType=["a;b", "c"]))
+    assert out["DevType"].tolist() == ["a", "b", "c"]
+    assert out[preprocessing.RESPONDENT].tolist() == [0, 0, 1]
+
+
+def test_salary_cutoff_drops_top_salaries():
+    df = pd.DataFrame({"ConvertedComp": range(1, 101)})
+    assert preprocessing.pre_processing(df)["ConvertedComp"].max() < 93
+
+
+def test_split_picks_80_percent_of_rows():
+    df = preprocessing.filter_chunk(raw_rows(10))
+    train, test = preprocessing.splitting(df)
+    assert len(train) == 8
+    assert len(test) == 2
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_split_keeps_respondents_together(seed):
+    df = preprocessing.filter_chunk(raw_rows(10, DevType=["a;b;c"] * 10))
+    train, test = preprocessing.splitting(df, seed=seed, groups=df[preprocessing.RESPONDENT])
+    assert not set(train[preprocessing.RESPONDENT]) & set(test[preprocessing.RESPONDENT])
+    assert train[preprocessing.RESPONDENT].nunique() == 8
+
+
+def test_main_reads_filters_and_writes_split(tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS_DIR", str(tmp_path / "metrics"))
+    raw = tmp_path / "raw.csv"
+    raw_rows(10).to_csv(raw, index=False)
+    preprocessing.main(str(raw), str(tmp_path / "processed"))
+    train = pd.read_csv(tmp_path / "processed" / "training.csv")
+    test = pd.read_csv(tmp_path / "processed" / "test.csv")
+    assert list(train.columns) == preprocessing.OUTPUT_COLUMNS + [preprocessing.RESPONDENT]
+    assert len(train) + len(test) == 9
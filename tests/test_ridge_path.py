@@ -0,0 +1,50 @@
+"""Tests of the closed-form Ridge regularization path."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import sparse as sp
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import RandomizedSearchCV
+from sklearn.pipeline import make_pipeline
+
+from ridge_path import RidgePathSearch, ridge_path
+from salary_prediction_model import make_preprocessor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+from synthetic_survey import make_survey  # noqa: E402
+
+ALPHAS = np.logspace(-3, 5, 9)
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_path_matches_ridge_for_every_alpha(sparse):
+    rng = np.random.RandomState(0)
+    X = rng.binomial(1, 0.3, size=(200, 15)).astype(float)
+    y = X @ rng.normal(size=15) + rng.normal(size=200)
+    coefs, intercepts = ridge_path(sp.csr_matrix(X) if sparse else X, y, ALPHAS)
+    for i, alpha in enumerate(ALPHAS):
+        ridge = Ridge(alpha=alpha).fit(X, y)
+        np.testing.assert_allclose(coefs[:, i], ridge.coef_, rtol=1e-6, atol=1e-8)
+        assert intercepts[i] == pytest.approx(ridge.intercept_)
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_search_matches_randomized_search_with_kfold(sparse):
+    df = make_survey(300, seed=4)
+    X, y = df.drop(columns=["ConvertedComp"]), df["ConvertedComp"]
+    pipe = make_pipeline(make_preprocessor(sparse=sparse), Ridge(solver="sparse_cg" if sparse else "auto"))
+    path = RidgePathSearch(pipe, alphas=ALPHAS, cv=5).fit(X, y)
+    search = RandomizedSearchCV(pipe, {"ridge__alpha": ALPHAS}, n_iter=len(ALPHAS), cv=5,
+                                random_state=0, return_train_score=True).fit(X, y)
+    order = np.argsort(search.cv_results_["param_ridge__alpha"].astype(float))
+    # the sparse pipeline fits Ridge with sparse_cg, an iterative solver with tol=1e-4
+    rtol = 1e-3 if sparse else 1e-6
+    for i in range(5):
+        np.testing.assert_allclose(path.cv_results_[f"split{i}_test_score"],
+                                   search.cv_results_[f"split{i}_test_score"][order], rtol=rtol)
+    np.testing.assert_array_equal(path.cv_results_["rank_test_score"], search.cv_results_["rank_test_score"][order])
+    assert path.best_params_ == pytest.approx(search.best_params_)
+    assert path.score(X, y) == pytest.approx(search.score(X, y), rel=rtol)
@@ -0,0 +1,70 @@
+"""Tests of the pipeline DAG runner on a small pipeline of copy commands."""
+
+import sys
+
+import pytest
+
+import run_pipeline
+
+COPY = "import shutil, sys; shutil.copy(sys.argv[1], sys.argv[2])"
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "raw.txt").write_text("raw")
+    stages = [
+        {"name": "a", "cmd": [sys.executable, "-c", COPY, "raw.txt", "a.txt"],
+         "inputs": ["raw.txt"], "outputs": ["a.txt"]},
+        {"name": "b", "cmd": [sys.executable, "-c", COPY, "a.txt", "b.txt"],
+         "inputs": ["a.txt"], "outputs": ["b.txt"]},
+        {"name": "c", "cmd": [sys.executable, "-c", COPY, "b.txt", "c.txt"],
+         "inputs": ["b.txt"], "outputs": ["c.txt"]},
+    ]
+    monkeypatch.setattr(run_pipeline, "STAGES", stages)
+    return tmp_path
+
+
+def statuses(capsys):
+    out = capsys.readouterr().out
+    return {line.split("]")[0][1:]: line.split("] ")[1] for line in out.splitlines()
+            if not line.split("] ")[1].startswith(sys.executable)}
+
+
+def test_dependencies_follow_outputs(pipeline):
+    assert run_pipeline.dependencies(run_pipeline.STAGES) == {"a": set(), "b": {"a"}, "c": {"b"}}
+
+
+def test_second_run_is_up_to_date(pipeline, capsys):
+    run_pipeline.main()
+    assert (pipeline / "c.txt").read_text() == "raw"
+    capsys.readouterr()
+    run_pipeline.main()
+    assert statuses(capsys) == {"a": "up to date", "b": "up to date", "c": "up to date"}
+
+
+def test_touching_without_changing_reruns_nothing(pipeline, capsys):
+    run_pipeline.main()
+    capsys.readouterr()
+    (pipeline / "raw.txt").write_text("raw")
+    run_pipeline.main(dry_run=True)
+    assert set(statuses(capsys).values()) == {"up to date"}
+
+
+def test_dry_run_marks_dependents_of_a_changed_stage(pipeline, capsys):
+    run_pipeline.main()
+    capsys.readouterr()
+    (pipeline / "raw.txt").write_text("changed")
+    run_pipeline.main(dry_run=True)
+    assert statuses(capsys) == {"a": "would run", "b": "would run", "c": "would run"}
+    # nothing ran
+    assert (pipeline / "c.txt").read_text() == "raw"
+
+
+def test_failed_stage_skips_its_dependents(pipeline, capsys):
+    run_pipeline.STAGES[0]["cmd"] = [sys.executable, "-c", "raise SystemExit(1)"]
+    with pytest.raises(SystemExit):
+        run_pipeline.main()
+    result = statuses(capsys)
+    assert result["a"].startswith("failed")
+    assert result["b"] == result["c"] == "skipped, an upstream stage failed"
@@ -0,0 +1,90 @@
+"""Tests of the model training: the alpha searches and the respondent-grouped folds."""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from joblib import load
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import GroupKFold, RandomizedSearchCV
+from sklearn.pipeline import make_pipeline
+
+from ridge_path import RidgePathSearch
+import salary_prediction_model
+from salary_prediction_model import RESPONDENT, build_model, make_preprocessor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+from synthetic_survey import make_survey  # noqa: E402
+
+ALPHAS = np.logspace(-3, 5, 9)
+
+
+@pytest.fixture(scope="module")
+def survey():
+    df = make_survey(400, seed=1)
+    # every third respondent reports two roles, one row each
+    df[RESPONDENT] = np.arange(len(df))
+    extra = df.iloc[::3].assign(DevType="Data scientist or machine learning specialist")
+    return pd.concat([df, extra], ignore_index=True)
+
+
+@pytest.mark.parametrize("multi_hot", [False, True])
+def test_path_search_matches_randomized_search(survey, multi_hot):
+    X = survey.drop(columns=["ConvertedComp", RESPONDENT])
+    y = survey["ConvertedComp"]
+    groups = survey[RESPONDENT]
+    pipe = make_pipeline(make_preprocessor(multi_hot=multi_hot), Ridge())
+    path = RidgePathSearch(pipe, alphas=ALPHAS, cv=GroupKFold(5)).fit(X, y, groups=groups)
+    search = RandomizedSearchCV(pipe, {"ridge__alpha": ALPHAS}, n_iter=len(ALPHAS), cv=GroupKFold(5),
+                                random_state=0, return_train_score=True).fit(X, y, groups=groups)
+    order = np.argsort(search.cv_results_["param_ridge__alpha"].astype(float))
+    np.testing.assert_allclose(path.cv_results_["mean_test_score"], search.cv_results_["mean_test_score"][order],
+                               rtol=1e-6)
+    np.testing.assert_allclose(path.cv_results_["mean_train_score"], search.cv_results_["mean_train_score"][order],
+                               rtol=1e-6)
+    assert path.best_params_ == pytest.approx(search.best_params_)
+    np.testing.assert_allclose(path.predict(X), search.predict(X), rtol=1e-6)
+
+
+@pytest.mark.parametrize("tuning", ["random", "path"])
+def test_build_model_keeps_respondents_in_one_fold(survey, tuning, tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_METRICS_DIR", str(tmp_path / "metrics"))
+    split = {}
+    original = GroupKFold.split
+
+    def recording_split(self, X, y=None, groups=None):
+        for train_idx, test_idx in original(self, X, y, groups):
+            split.setdefault("groups", []).append(groups is not None)
+            assert not set(np.asarray(groups)[train_idx]) & set(np.asarray(groups)[test_idx])
+            yield train_idx, test_idx
+
+    monkeypatch.setattr(GroupKFold, "split", recording_split)
+    build_model(survey, str(tmp_path), survey.iloc[:50], tuning=tuning, n_jobs=1)
+    assert split["groups"] == [True] * 5
+    model = load(tmp_path / "best_model_pipe.joblib")
+    # the id is not a feature, so profiles without it can be scored
+    assert np.isfinite(model.predict(survey.drop(columns=[RESPONDENT]).iloc[:5])).all()
+    assert load(tmp_path / "test_result.joblib")["predict_y"].shape == (50,)
+
+
+WORKER_THREADS = """
+import numpy
+from joblib import Parallel, delayed
+from threadpoolctl import threadpool_info
+from salary_prediction_model import parallel_config
+with parallel_config(2, "multiprocessing", 3):
+    print(max(i["num_threads"] for info in Parallel()(delayed(threadpool_info)() for _ in range(2)) for i in info))
+"""
+
+
+def test_multiprocessing_workers_apply_the_blas_cap():
+    # forkserver workers do not inherit the thread pools of this process, so only the
+    # pool initializer can cap them
+    src = os.path.dirname(os.path.abspath(salary_prediction_model.__file__))
+    env = dict(os.environ, JOBLIB_START_METHOD="forkserver")
+    out = subprocess.run([sys.executable, "-c", WORKER_THREADS], cwd=src, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    assert out.strip() == "3"
@@ -0,0 +1,80 @@
+"""Tests of the salary lookup table against the sklearn pipeline it was built from."""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from joblib import dump
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+
+import salary_table
+from compact_model import FEATURES, export
+from salary_prediction_model import make_preprocessor
+from salary_table import SalaryTable, build_table
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+from synthetic_survey import make_survey  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def survey():
+    df = make_survey(400, seed=6)
+    df.loc[::9, "YearsCodePro"] = np.nan
+    df.loc[::7, "EdLevel"] = np.nan
+    return df
+
+
+def fit(survey, multi_hot):
+    X, y = survey.drop(columns=["ConvertedComp"]), survey["ConvertedComp"]
+    return make_pipeline(make_preprocessor(multi_hot=multi_hot), Ridge(alpha=2.0)).fit(X, y)
+
+
+def lookups(table, frame):
+    return np.array([table.lookup(row.DevType, row.EdLevel, row.LanguageWorkedWith, row.YearsCodePro)
+                     for row in frame.itertuples()])
+
+
+@pytest.mark.parametrize("multi_hot", [False, True])
+def test_lookup_matches_the_pipeline(survey, multi_hot, tmp_path):
+    pipe = fit(survey, multi_hot)
+    build_table(export(pipe), str(tmp_path), max_years=50)
+    table = SalaryTable.load(str(tmp_path))
+    X = survey[FEATURES]
+    np.testing.assert_allclose(lookups(table, X), pipe.predict(X), rtol=1e-9)
+
+    # fractional and out-of-table years, unseen and missing answers
+    odd = pd.DataFrame({"YearsCodePro": [2.5, 60.0, np.nan], "DevType": ["Astronaut", np.nan, "Astronaut"],
+                        "EdLevel": [np.nan, "Clown college", np.nan],
+                        "LanguageWorkedWith": ["Python;COBOL", np.nan, "Go"]})
+    np.testing.assert_allclose(lookups(table, odd), pipe.predict(odd), rtol=1e-9)
+    # None is the same missing answer as NaN
+    missing = pd.DataFrame([dict.fromkeys(FEATURES, np.nan)])
+    assert table.lookup(None, None, None, None) == pytest.approx(pipe.predict(missing)[0])
+
+
+def test_full_grid_matches_lookups(survey, tmp_path):
+    pipe = fit(survey, multi_hot=False)
+    table = build_table(export(pipe), str(tmp_path), max_years=5, full_grid=True)
+    grid = np.load(tmp_path / "grid.npy")
+    labels = {dim["column"]: dim["labels"] for dim in json.loads((tmp_path / "meta.json").read_text())["dimensions"]}
+    assert grid.shape == (len(labels["DevType"]), len(labels["EdLevel"]), len(labels["LanguageWorkedWith"]), 5)
+    rng = np.random.RandomState(0)
+    for _ in range(20):
+        i, j, k, year = (rng.randint(n) for n in grid.shape)
+        expected = table.lookup(labels["DevType"][i], labels["EdLevel"][j], labels["LanguageWorkedWith"][k], year + 1)
+        assert grid[i, j, k, year] == pytest.approx(expected, rel=1e-6)
+
+
+def test_main_accepts_a_pipeline_or_a_compact_model(survey, tmp_path):
+    pipe = fit(survey, multi_hot=True)
+    dump(pipe, tmp_path / "model.joblib")
+    salary_table.main(str(tmp_path / "model.joblib"), str(tmp_path / "from_pipeline"))
+    export(pipe).save(str(tmp_path / "compact"))
+    salary_table.main(str(tmp_path / "compact"), str(tmp_path / "from_compact"))
+    X = survey[FEATURES].iloc[:20]
+    np.testing.assert_allclose(lookups(SalaryTable.load(str(tmp_path / "from_pipeline")), X),
+                               lookups(SalaryTable.load(str(tmp_path / "from_compact")), X))
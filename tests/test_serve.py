@@ -0,0 +1,146 @@
+"""Tests of the micro-batching prediction server."""
+
+import asyncio
+import json
+
+import numpy as np
+
+import serve
+
+PROFILE = {"YearsCodePro": 5, "DevType": "Developer, back-end", "EdLevel": "Master’s degree",
+           "LanguageWorkedWith": "Python;SQL"}
+
+
+class StubModel:
+    # predicts 1000 * YearsCodePro, fails on negative years, crashes on 13
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, X):
+        self.batch_sizes.append(len(X))
+        years = X["YearsCodePro"].astype(float).to_numpy()
+        if (years < 0).any():
+            raise ValueError("negative YearsCodePro")
+        if (years == 13).any():
+            raise RuntimeError("unlucky")
+        return 1000 * years
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+    return int(head.split(b" ")[1]), json.loads(await reader.readexactly(length))
+
+
+async def _exchange(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    response = await _read_response(reader)
+    writer.close()
+    return response
+
+
+def _post(body):
+    data = json.dumps(body).encode()
+    return (b"POST /predict HTTP/1.1\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+
+
+def run_server(test, model=None, **kwargs):
+    async def main():
+        batcher = serve.MicroBatcher(model or StubModel(), **kwargs)
+        worker = asyncio.create_task(batcher.run())
+        server = await asyncio.start_server(serve.make_handler(batcher), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await test(port, batcher)
+        finally:
+            server.close()
+            worker.cancel()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_a_batch():
+    model = StubModel()
+
+    async def test(port, batcher):
+        results = await asyncio.gather(*[_exchange(port, _post(dict(PROFILE, YearsCodePro=i))) for i in range(8)])
+        assert results == [(200, {"predictions": [1000.0 * i]}) for i in range(8)]
+        return batcher.metrics()
+
+    metrics = run_server(test, model, max_wait_ms=50)
+    assert metrics["requests"] == 8 and metrics["batches"] < 8
+    assert max(model.batch_sizes) > 1
+
+
+def test_bad_profile_does_not_fail_the_batch():
+    async def test(port, batcher):
+        return await asyncio.gather(_exchange(port, _post(dict(PROFILE, YearsCodePro=-1))),
+                                    _exchange(port, _post(PROFILE)))
+
+    bad, good = run_server(test, max_wait_ms=50)
+    assert bad[0] == 400 and "negative" in bad[1]["error"]
+    assert good == (200, {"predictions": [5000.0]})
+
+
+def test_model_failure_is_a_server_error():
+    async def test(port, batcher):
+        return await _exchange(port, _post(dict(PROFILE, YearsCodePro=13)))
+
+    status, body = run_server(test)
+    assert status == 500 and "unlucky" in body["error"]
+
+
+def test_malformed_requests_are_bad_requests():
+    async def test(port, batcher):
+        return await asyncio.gather(
+            _exchange(port, b"garbage\r\n\r\n"),
+            _exchange(port, b"POST /predict HTTP/1.1\r\nContent-Length: ten\r\n\r\n"),
+            _exchange(port, b"POST /predict HTTP/1.1\r\nContent-Length: -4\r\n\r\n"),
+            _exchange(port, _post([1, 2])),
+            _exchange(port, b"POST /predict HTTP/1.1\r\nContent-Length: 3\r\n\r\n{x}"),
+        )
+
+    for status, body in run_server(test):
+        assert status == 400 and body["error"]
+
+
+def test_routes():
+    async def test(port, batcher):
+        return await asyncio.gather(
+            _exchange(port, b"GET /metrics HTTP/1.1\r\n\r\n"),
+            _exchange(port, b"GET /predict HTTP/1.1\r\n\r\n"),
+            _exchange(port, b"GET /nowhere HTTP/1.1\r\n\r\n"),
+        )
+
+    (metrics_status, metrics), (get_status, _), (missing_status, _) = run_server(test)
+    assert metrics_status == 200 and metrics["requests"] == 0 and metrics["cache"] is None
+    assert (get_status, missing_status) == (405, 404)
+
+
+def test_keep_alive_serves_several_requests():
+    async def test(port, batcher):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        statuses = []
+        for years in (1, 2):
+            writer.write(_post(dict(PROFILE, YearsCodePro=years)))
+            await writer.drain()
+            statuses.append(await _read_response(reader))
+        writer.close()
+        return statuses
+
+    assert run_server(test) == [(200, {"predictions": [1000.0]}), (200, {"predictions": [2000.0]})]
+
+
+def test_micro_batcher_predicts_in_order():
+    async def main():
+        batcher = serve.MicroBatcher(StubModel(), max_wait_ms=10)
+        worker = asyncio.create_task(batcher.run())
+        try:
+            return await batcher.predict([dict(PROFILE, YearsCodePro=y) for y in (3, 1, 2)])
+        finally:
+            worker.cancel()
+
+    np.testing.assert_allclose(asyncio.run(main()), [3000.0, 1000.0, 2000.0])
@@ -0,0 +1,18 @@
+"""Import-time budget of the pipeline entry points, see benchmarks/bench_startup.py."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+
+import bench_startup  # noqa: E402
+
+
+@pytest.mark.parametrize("module", bench_startup.MODULES)
+def test_import_time_within_budget(module):
+    budget = bench_startup.BUDGET_OVERRIDES_MS.get(module, bench_startup.BUDGET_MS)
+    # the fastest of three fresh interpreters, so a busy machine does not fail the check
+    elapsed = min(bench_startup.import_time_ms(module) for _ in range(3))
+    assert elapsed <= budget, f"importing {module} took {elapsed:.0f} ms, budget {budget} ms"